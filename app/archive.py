@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import Order
+from app.schemas import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 60))
+# Terminal orders stay in the live table this long, so recent history is still served from it.
+ARCHIVE_AFTER = timedelta(seconds=float(os.getenv("ARCHIVE_AFTER", 3600)))
+# pg_advisory_xact_lock key: only one process archives at a time.
+ARCHIVER_LOCK_ID = 0x6f72636876
+
+TERMINAL_STATUSES = (OrderStatus.EXECUTED, OrderStatus.CANCELLED)
+
+_COLUMNS = ", ".join(column.name for column in Order.__table__.columns)
+
+
+def partition_name(month: datetime) -> str:
+    return f"orders_archive_{month:%Y_%m}"
+
+
+async def _create_partitions(db: AsyncSession, months: Iterable[datetime]):
+    for month in sorted(set(months)):
+        upper = (month + timedelta(days=32)).replace(day=1)
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF orders_archive "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+
+
+async def archive_batch(db: AsyncSession) -> int:
+    locked = await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVER_LOCK_ID})
+    if not locked.scalar():
+        return 0
+
+    candidates = (await db.execute(
+        select(Order.id, Order.created_at)
+        .filter(Order.status.in_(TERMINAL_STATUSES), Order.created_at < datetime.utcnow() - ARCHIVE_AFTER)
+        .order_by(Order.created_at)
+        .limit(ARCHIVE_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if not candidates:
+        return 0
+
+    await _create_partitions(db, (created_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                                  for _, created_at in candidates))
+    await db.execute(
+        text(
+            f"WITH moved AS (DELETE FROM orders WHERE id = ANY(:ids) RETURNING {_COLUMNS}) "
+            f"INSERT INTO orders_archive ({_COLUMNS}) SELECT {_COLUMNS} FROM moved"
+        ),
+        {"ids": [order_id for order_id, _ in candidates]}
+    )
+    return len(candidates)
+
+
+async def archive_periodically():
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                moved = await archive_batch(db)
+                await db.commit()
+            if moved:
+                logger.info(f"Archived {moved} terminal orders")
+            # Drain a backlog without waiting a full interval between batches.
+            if moved == ARCHIVE_BATCH_SIZE:
+                continue
+        except SQLAlchemyError as exc:
+            logger.error(f"Order archiving failed: {exc}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import os
+
+import asyncpg
+
+from app.cache import TTLCache
+from app.database import DATABASE_DSN
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "api_key_invalidated"
+
+api_key_cache = TTLCache(
+    maxsize=int(os.getenv("API_KEY_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("API_KEY_CACHE_TTL", 60))
+)
+
+
+def _on_invalidation(connection, pid, channel, api_key):
+    api_key_cache.pop(api_key)
+
+
+async def listen_for_invalidations(retry_interval: float = 5):
+    # The users trigger NOTIFYs on role/api_key changes and deletes, so every
+    # worker drops the key, not only the one that served the admin request.
+    while True:
+        try:
+            connection = await asyncpg.connect(DATABASE_DSN)
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.warning(f"API key invalidation listener cannot connect: {exc}")
+            await asyncio.sleep(retry_interval)
+            continue
+
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        try:
+            await connection.add_listener(INVALIDATION_CHANNEL, _on_invalidation)
+            # Notifications sent while we were not listening are lost.
+            api_key_cache.clear()
+            await closed.wait()
+            logger.warning("API key invalidation listener disconnected")
+        finally:
+            await connection.close()
+            api_key_cache.clear()
@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+import os
+from typing import List, Tuple, Type
+from uuid import uuid4
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import User
+from app.schemas import BulkBalanceOperation, NewUser, UserRole
+from app.settlement import SETTLEMENT_CURRENCY
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", 100000))
+
+# Rows are numbered from 1 in input order, not counting a CSV header.
+# Each statement below handles the whole staged batch at once. The
+# settlement currency is held like any ticker but is not an instrument.
+REJECT_UNKNOWN = text("""
+    DELETE FROM balance_ops_staging s
+    WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id)
+       OR (s.ticker <> :settlement_currency AND NOT EXISTS (SELECT 1 FROM instruments i WHERE i.ticker = s.ticker))
+    RETURNING s.line, CASE
+        WHEN NOT EXISTS (SELECT 1 FROM users u WHERE u.id = s.user_id) THEN 'User not found'
+        ELSE 'Instrument not found'
+    END
+""")
+# In the order write_settlement locks balances, so the two cannot deadlock.
+LOCK_BALANCES = text("""
+    SELECT 1 FROM balances b
+    WHERE (b.user_id, b.ticker) IN (SELECT user_id, ticker FROM balance_ops_staging)
+    ORDER BY b.user_id, b.ticker
+    FOR UPDATE OF b
+""")
+# A balance the batch would leave negative gets none of its withdrawals.
+REJECT_INSUFFICIENT = text("""
+    DELETE FROM balance_ops_staging s
+    USING (
+        SELECT st.user_id, st.ticker
+        FROM balance_ops_staging st
+        LEFT JOIN balances b ON b.user_id = st.user_id AND b.ticker = st.ticker
+        GROUP BY st.user_id, st.ticker, b.amount
+        HAVING COALESCE(b.amount, 0) + sum(st.amount) < 0
+    ) short
+    WHERE s.user_id = short.user_id AND s.ticker = short.ticker AND s.amount < 0
+    RETURNING s.line, 'Insufficient funds'
+""")
+APPLY_BALANCES = text("""
+    INSERT INTO balances (user_id, ticker, amount)
+    SELECT user_id, ticker, sum(amount) FROM balance_ops_staging
+    GROUP BY user_id, ticker
+    ORDER BY user_id, ticker
+    ON CONFLICT (user_id, ticker) DO UPDATE SET amount = balances.amount + excluded.amount
+""")
+REJECT_LONG_NAMES = text("DELETE FROM users_staging WHERE length(name) > :max_length RETURNING line")
+APPLY_USERS = text("""
+    INSERT INTO users (id, name, role, api_key)
+    SELECT id, name, CAST(:role AS userrole), api_key FROM users_staging ORDER BY line
+    RETURNING id, name, api_key
+""")
+
+
+def _error(row: int, detail: str) -> dict:
+    return {"row": row, "detail": detail}
+
+
+def _records(body: bytes, content_type: str):
+    try:
+        data = body.decode()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body is not UTF-8")
+
+    if "csv" in content_type:
+        for record in csv.DictReader(io.StringIO(data)):
+            # Values beyond the header row are collected under None.
+            yield {key: value for key, value in record.items() if key is not None}
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        for line in data.splitlines():
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+    else:
+        raise HTTPException(status_code=415, detail="Expected text/csv or application/x-ndjson")
+
+
+def parse_rows(body: bytes, content_type: str, model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[dict]]:
+    rows, errors = [], []
+    for row, record in enumerate(_records(body, content_type), 1):
+        if row > BULK_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per request")
+        if not isinstance(record, dict):
+            errors.append(_error(row, "Malformed row"))
+            continue
+        try:
+            rows.append((row, model.model_validate(record)))
+        except ValidationError as exc:
+            errors.append(_error(row, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            )))
+    return rows, errors
+
+
+async def _copy(db: AsyncSession, table: str, columns: List[str], records: List[tuple]):
+    # COPY goes through the session's asyncpg connection, inside its transaction.
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table, records=records, columns=columns)
+
+
+async def apply_balance_operations(db: AsyncSession, operations: List[Tuple[int, BulkBalanceOperation]]) -> List[dict]:
+    await db.execute(text(
+        "CREATE TEMP TABLE balance_ops_staging "
+        "(line integer PRIMARY KEY, user_id uuid NOT NULL, ticker text NOT NULL, amount bigint NOT NULL) "
+        "ON COMMIT DROP"
+    ))
+    await _copy(db, "balance_ops_staging", ["line", "user_id", "ticker", "amount"], [
+        (row, operation.user_id, operation.ticker, operation.amount if operation.op == "deposit" else -operation.amount)
+        for row, operation in operations
+    ])
+
+    errors = [_error(row, detail) for row, detail in await db.execute(REJECT_UNKNOWN, {"settlement_currency": SETTLEMENT_CURRENCY})]
+    await db.execute(LOCK_BALANCES)
+    errors += [_error(row, detail) for row, detail in await db.execute(REJECT_INSUFFICIENT)]
+    await db.execute(APPLY_BALANCES)
+    return errors
+
+
+async def create_users(db: AsyncSession, users: List[Tuple[int, NewUser]]) -> Tuple[List[dict], List[dict]]:
+    await db.execute(text(
+        "CREATE TEMP TABLE users_staging "
+        "(line integer PRIMARY KEY, id uuid NOT NULL, name text NOT NULL, api_key text NOT NULL) "
+        "ON COMMIT DROP"
+    ))
+    await _copy(db, "users_staging", ["line", "id", "name", "api_key"], [
+        (row, uuid4(), user.name, str(uuid4())) for row, user in users
+    ])
+
+    max_length = User.__table__.c.name.type.length
+    errors = [
+        _error(row, f"Name is longer than {max_length} characters")
+        for row, in await db.execute(REJECT_LONG_NAMES, {"max_length": max_length})
+    ]
+    created = [
+        {"id": str(user_id), "name": name, "role": UserRole.USER.value, "api_key": api_key}
+        for user_id, name, api_key in await db.execute(APPLY_USERS, {"role": UserRole.USER.name})
+    ]
+    return created, errors
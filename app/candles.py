@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Candle
+from app.schemas import CandleInterval
+
+INTERVALS = {
+    CandleInterval.MINUTE: timedelta(minutes=1),
+    CandleInterval.FIVE_MINUTES: timedelta(minutes=5),
+    CandleInterval.HOUR: timedelta(hours=1),
+    CandleInterval.DAY: timedelta(days=1),
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+# open, high, low, close, volume
+OHLCV = List[int]
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    # Timestamps are stored as naive UTC, like Transaction.timestamp.
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(timestamp: datetime, interval: CandleInterval) -> datetime:
+    return timestamp - (timestamp - EPOCH) % INTERVALS[interval]
+
+
+def _merge(candles: Dict[datetime, OHLCV], bucket: datetime, open_, high, low, close, volume):
+    candle = candles.get(bucket)
+    if candle is None:
+        candles[bucket] = [open_, high, low, close, volume]
+    else:
+        candle[1] = max(candle[1], high)
+        candle[2] = min(candle[2], low)
+        candle[3] = close
+        candle[4] += volume
+
+
+def rollup(trades: Iterable[Tuple[datetime, int, int]]) -> Dict[CandleInterval, Dict[datetime, OHLCV]]:
+    # Trades are (timestamp, qty, price) in execution order. Minute candles
+    # are built from the trades, every coarser interval from the one below it.
+    intervals = list(INTERVALS)
+    rolled = {interval: {} for interval in intervals}
+
+    for timestamp, qty, price in trades:
+        _merge(rolled[intervals[0]], bucket_start(timestamp, intervals[0]), price, price, price, price, qty)
+
+    for finer, coarser in zip(intervals, intervals[1:]):
+        for bucket, candle in rolled[finer].items():
+            _merge(rolled[coarser], bucket_start(bucket, coarser), *candle)
+    return rolled
+
+
+async def write_candles(db: AsyncSession, ticker: str, trades: Iterable[Tuple[datetime, int, int]]):
+    rows = [
+        {
+            "ticker": ticker, "interval": interval.value, "bucket": bucket,
+            "open": open_, "high": high, "low": low, "close": close, "volume": volume
+        }
+        for interval, candles in rollup(trades).items()
+        for bucket, (open_, high, low, close, volume) in candles.items()
+    ]
+    if not rows:
+        return
+
+    upsert = pg_insert(Candle).values(rows)
+    await db.execute(upsert.on_conflict_do_update(
+        index_elements=[Candle.ticker, Candle.interval, Candle.bucket],
+        set_={
+            "high": func.greatest(Candle.high, upsert.excluded.high),
+            "low": func.least(Candle.low, upsert.excluded.low),
+            "close": upsert.excluded.close,
+            "volume": Candle.volume + upsert.excluded.volume,
+        }
+    ))
@@ -3,6 +3,8 @@ from sqlalchemy.orm import declarative_base
 import os
 from dotenv import load_dotenv
 
+from app.metrics import MeteredPool, watch_pool
+
 load_dotenv('../.env-prod')
 
 DB_HOST = os.getenv("DB_HOST")
@@ -11,10 +13,21 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
-DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DATABASE_DSN = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DATABASE_URL = DATABASE_DSN.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+# Public market-data reads go to a streaming replica when one is configured,
+# and otherwise to the primary through a pool of their own.
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+READ_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
+    if DB_REPLICA_HOST else DATABASE_URL
+)
 
 engine = create_async_engine(
     DATABASE_URL,
+    poolclass=MeteredPool,
     pool_size=20,
     max_overflow=10,
     pool_pre_ping=True,
@@ -26,6 +39,34 @@ engine = create_async_engine(
         }
     }
 )
+watch_pool(engine)
+
+
+class ReadPool(MeteredPool):
+    label = "read"
+
+
+# Without a replica, reads share the primary's pool rather than holding a
+# second one open against the same server's max_connections.
+read_engine = create_async_engine(
+    READ_DATABASE_URL,
+    poolclass=ReadPool,
+    pool_size=10,
+    max_overflow=5,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    # No BEGIN/COMMIT round trips, and the server rejects any write.
+    isolation_level="AUTOCOMMIT",
+    connect_args={
+        "command_timeout": 60,
+        "server_settings": {
+            "application_name": "FastAPI App (read)",
+            "default_transaction_read_only": "on"
+        }
+    }
+) if DB_REPLICA_HOST else engine.execution_options(isolation_level="AUTOCOMMIT")
+if DB_REPLICA_HOST:
+    watch_pool(read_engine)
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -34,4 +75,11 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
 Base = declarative_base()
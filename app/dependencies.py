@@ -1,13 +1,26 @@
-from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials
-from fastapi import Depends, HTTPException, status, Header, Security
-from sqlalchemy import select
+import time
+from datetime import datetime
+from typing import List
+from uuid import uuid4
+
+from fastapi.security import APIKeyHeader
+from fastapi import Depends, HTTPException, status
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
 
+from app import journal
+from app.auth import api_key_cache
+from app.candles import write_candles
 from app.database import AsyncSessionLocal
-from app.models import User, Order, Balance, Transaction
-from app.schemas import UserRole, Direction, OrderStatus
+from app.feed import feed
+from app.metrics import FILLS_PER_ORDER, MATCH_DURATION
+from app.models import User, Order, Balance, Transaction, UserFill
+from app.replica import read_session
+from app.settlement import Settlement, match_order
+from app.schemas import UserRole
 
 security = APIKeyHeader(name="Authorization")
 
@@ -24,8 +37,14 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_read_db() -> AsyncSession:
+    # For public reads: autocommit and read-only, on the replica unless it lags too far behind.
+    async with read_session() as session:
+        yield session
+
+
 async def get_current_user(
-        credentials: HTTPAuthorizationCredentials = Depends(security),
+        credentials: str = Depends(security),
         db: AsyncSession = Depends(get_db)
 ) -> User:
     if not credentials:
@@ -34,16 +53,21 @@ async def get_current_user(
             detail="Authorization header is missing"
         )
 
-    api_key = credentials.credentials
+    api_key = credentials.removeprefix("TOKEN ").strip()
 
-    try:
-        user = await db.execute(select(User).filter(User.api_key == api_key))
-        return user.scalar_one()
-    except NoResultFound:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid authentication credentials"
-        )
+    cached = api_key_cache.get(api_key)
+    if cached is None:
+        try:
+            result = await db.execute(select(User.id, User.name, User.role).filter(User.api_key == api_key))
+            cached = api_key_cache.set(api_key, tuple(result.one()))
+        except NoResultFound:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Invalid authentication credentials"
+            )
+
+    user_id, name, role = cached
+    return User(id=user_id, name=name, role=role, api_key=api_key)
 
 
 async def get_admin_user(user: User = Depends(get_current_user)) -> User:
@@ -52,84 +76,74 @@ async def get_admin_user(user: User = Depends(get_current_user)) -> User:
     return user
 
 
-def match_order(db: Session, order: Order):
-    try:
-        opposite_direction = Direction.SELL if order.direction == Direction.BUY else Direction.BUY
-        base_currency, quote_currency = ('RUB', order.ticker) if order.direction == Direction.BUY else (
-            order.ticker, 'RUB')
-
-        query = db.query(Order).filter(
-            Order.ticker == order.ticker,
-            Order.direction == opposite_direction,
-            Order.status.in_([OrderStatus.NEW, OrderStatus.PARTIALLY_EXECUTED])
+async def write_settlement(db: AsyncSession, settlement: Settlement, timestamp: datetime):
+    if not settlement.fills:
+        return
+
+    # Sorted so concurrent settlements touching the same balances lock rows in the same order.
+    rows = [
+        {"user_id": user_id, "ticker": ticker, "amount": amount}
+        for (user_id, ticker), amount in sorted(settlement.balances.items(), key=lambda item: (str(item[0][0]), item[0][1]))
+        if amount
+    ]
+    if rows:
+        upsert = pg_insert(Balance).values(rows)
+        await db.execute(upsert.on_conflict_do_update(
+            index_elements=[Balance.user_id, Balance.ticker],
+            set_={"amount": Balance.amount + upsert.excluded.amount}
+        ))
+
+    if settlement.orders:
+        await db.execute(
+            update(Order),
+            [{"id": order_id, "filled": filled, "status": status} for order_id, (filled, status) in settlement.orders.items()]
         )
 
-        if order.order_type == 'limit':
-            if order.direction == Direction.BUY:
-                query = query.filter(Order.price <= order.price)
-            else:
-                query = query.filter(Order.price >= order.price)
+    await db.execute(insert(Transaction).values([
+        {"id": uuid4(), "ticker": settlement.ticker, "amount": fill.qty, "price": fill.price, "timestamp": timestamp}
+        for fill in settlement.fills
+    ]))
 
-        matching_orders = query.order_by(
-            Order.price.asc() if order.direction == Direction.BUY else Order.price.desc()
-        ).all()
+    await db.execute(insert(UserFill).values([
+        {
+            "id": uuid4(), "user_id": user_id, "order_id": order_id, "counter_order_id": counter_order_id,
+            "ticker": settlement.ticker, "side": side, "qty": qty, "price": price, "timestamp": timestamp,
+        }
+        for user_id, order_id, counter_order_id, side, qty, price in settlement.user_fills
+    ]))
 
-        remaining_qty = order.qty - order.filled
-
-        for matching_order in matching_orders:
-            if remaining_qty <= 0:
-                break
-
-            matchable_qty = min(
-                remaining_qty,
-                matching_order.qty - matching_order.filled
-            )
+    await write_candles(db, settlement.ticker, ((timestamp, fill.qty, fill.price) for fill in settlement.fills))
 
-            execution_price = matching_order.price if order.order_type == 'market' else order.price
-            total_amount = matchable_qty * execution_price
 
-            with db.begin_nested():
-                buyer = order.user if order.direction == Direction.BUY else matching_order.user
-                seller = matching_order.user if order.direction == Direction.BUY else order.user
-
-                buyer_balance = db.query(Balance).filter(
-                    Balance.user_id == buyer.id,
-                    Balance.ticker == base_currency
-                ).first()
-
-                if not buyer_balance:
-                    buyer_balance = Balance(user_id=buyer.id, ticker=base_currency, amount=0)
-                    db.add(buyer_balance)
-
-                buyer_balance.amount += matchable_qty if order.direction == Direction.BUY else total_amount
-
-                seller_balance = db.query(Balance).filter(
-                    Balance.user_id == seller.id,
-                    Balance.ticker == quote_currency
-                ).first()
-
-                if not seller_balance:
-                    seller_balance = Balance(user_id=seller.id, ticker=quote_currency, amount=0)
-                    db.add(seller_balance)
-
-                seller_balance.amount += total_amount if order.direction == Direction.BUY else matchable_qty
-
-                order.filled += matchable_qty
-                matching_order.filled += matchable_qty
-
-                order.status = OrderStatus.EXECUTED if order.filled >= order.qty else OrderStatus.PARTIALLY_EXECUTED
-                matching_order.status = OrderStatus.EXECUTED if matching_order.filled >= matching_order.qty else OrderStatus.PARTIALLY_EXECUTED
-
-                transaction = Transaction(
-                    ticker=order.ticker,
-                    amount=matchable_qty,
-                    price=execution_price
-                )
-                db.add(transaction)
-
-                remaining_qty -= matchable_qty
-
-        db.commit()
-    except SQLAlchemyError as e:
-        db.rollback()
+async def match_orders(db: AsyncSession, orders: List[Order]):
+    # One matching pass and one settlement for a run of orders on the same ticker.
+    ticker = orders[0].ticker
+    try:
+        book = await journal.current_book(db, ticker)
+        settlement = Settlement(ticker)
+        for order in orders:
+            started, fills = time.perf_counter(), len(settlement.fills)
+            match_order(book, order, settlement)
+            MATCH_DURATION.observe(time.perf_counter() - started)
+            FILLS_PER_ORDER.observe(len(settlement.fills) - fills)
+
+        # An order of this run can rest and then be hit by a later one. It is
+        # already tracked by the session, so update it there instead of in bulk.
+        tracked = {order.id: order for order in orders}
+        for order_id in tracked.keys() & settlement.orders.keys():
+            tracked[order_id].filled, tracked[order_id].status = settlement.orders.pop(order_id)
+
+        timestamp = datetime.utcnow()
+        seq = await journal.append_events(db, settlement.events, timestamp)
+        await write_settlement(db, settlement, timestamp)
+        await db.commit()
+    except SQLAlchemyError:
+        # The book may already hold this run's fills; it is rebuilt from the
+        # database the next time the ticker is matched, not here with a
+        # connection that just failed.
+        journal.stale_books.add(ticker)
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error")
+
+    book.seq = seq
+    feed.publish(book, settlement.fills, timestamp)
@@ -1,21 +1,68 @@
-from typing import Union, List
+import asyncio
+from datetime import datetime
+from typing import Union, List, Optional
 from uuid import uuid4
 
-from fastapi import Depends, HTTPException, APIRouter
+import asyncpg
+from fastapi import Depends, HTTPException, APIRouter, Header, Query, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import UUID4
-from sqlalchemy import and_, text, select
+from sqlalchemy import and_, select, text, tuple_, union_all
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
 
-from app.dependencies import get_admin_user, get_db, get_current_user, match_order
-
-from app.models import User, Balance, Instrument, Order, Transaction
-from app.schemas import UserResponse, BalanceOperation, InstrumentSchema, OrderStatus, LimitOrderBody, MarketOrderBody, \
-    CreateOrderResponse, TransactionSchema, L2OrderBook, Level, UserRole, NewUser
+from app.auth import api_key_cache
+from app.bulk import apply_balance_operations, create_users, parse_rows
+from app.candles import bucket_start, naive_utc
+from app.database import AsyncSessionLocal
+from app.dependencies import get_admin_user, get_db, get_read_db, get_current_user
+from app.matcher import matcher
+from app.order_queue import enqueue, notify_queued
+
+from app.feed import MAX_SUBSCRIPTIONS, Subscriber, feed
+from app.models import User, Balance, Instrument, Order, OrderArchive, Transaction, Candle, UserFill
+from app.orderbook import OrderBook, books
+from app.replica import read_session
+from app.pagination import NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor, \
+    encode_seq_cursor, decode_seq_cursor
+from app.responses import ORJSONResponse, fill_rows, level_rows, order_rows, transaction_rows
+from app.tickers import board
+from app.schemas import ACTIVE_STATUSES, UserResponse, BalanceOperation, InstrumentSchema, OrderStatus, LimitOrderBody, MarketOrderBody, \
+    CreateOrderResponse, TransactionSchema, L2OrderBook, UserRole, NewUser, Direction, OrderBatch, \
+    BatchOrderResult, CancelOrderResult, MAX_BATCH_ORDERS, CandleInterval, CandleSchema, TickerSchema, \
+    BulkBalanceOperation, BulkBalanceResult, BulkUsersResult, FillSchema, OrderState
 
 router = APIRouter()
 
+MAX_CANDLES = 1000
+# Prefer: respond-async (RFC 7240) acknowledges orders once they are queued;
+# the outcome is read with get_order or pushed to the user's WebSocket.
+ACCEPTED_HEADERS = {"Preference-Applied": "respond-async"}
+# Fills are paged in the order of their transaction ids, up to the oldest
+# transaction still in progress: every fill behind the cursor has committed,
+# and every fill committed later is ahead of it.
+SYNC_HORIZON = text("CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS text) AS bigint)")
+
+
+async def _submit(db: AsyncSession, orders: List[Order]) -> Optional[dict]:
+    # None if the matcher failed: the orders stay queued and are matched by
+    # the queue consumer instead, so they never sit NEW outside any book.
+    try:
+        return await matcher.submit(db, orders)
+    except HTTPException as exc:
+        if exc.status_code < 500:
+            raise
+    try:
+        await notify_queued(db, {order.ticker for order in orders})
+        await db.commit()
+    except SQLAlchemyError:
+        # The consumer's periodic sweep still finds them.
+        await db.rollback()
+    return None
+
+
+def _respond_async(prefer: Optional[str]) -> bool:
+    return prefer is not None and "respond-async" in (token.strip() for token in prefer.split(","))
+
 
 @router.post("/public/register", response_model=UserResponse)
 async def register(user: NewUser, db: AsyncSession = Depends(get_db)):
@@ -43,60 +90,103 @@ async def register(user: NewUser, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/api/v1/public/instrument", response_model=List[InstrumentSchema])
-def list_instruments(db: Session = Depends(get_db)):
-    return db.query(Instrument).all()
+async def list_instruments(db: AsyncSession = Depends(get_read_db)):
+    result = await db.execute(select(Instrument))
+    return result.scalars().all()
 
 
 @router.get("/api/v1/public/orderbook/{ticker}", response_model=L2OrderBook)
-def get_orderbook(ticker: str, limit: int = 10, db: Session = Depends(get_db)):
-    bids = db.execute(text("""
-        SELECT price, SUM(qty - filled) as qty 
-        FROM orders 
-        WHERE ticker = :ticker AND direction = 'BUY' AND status IN ('NEW', 'PARTIALLY_EXECUTED')
-        GROUP BY price 
-        ORDER BY price DESC 
-        LIMIT :limit
-    """), {"ticker": ticker, "limit": limit}).fetchall()
-
-    asks = db.execute(text("""
-        SELECT price, SUM(qty - filled) as qty 
-        FROM orders 
-        WHERE ticker = :ticker AND direction = 'SELL' AND status IN ('NEW', 'PARTIALLY_EXECUTED')
-        GROUP BY price 
-        ORDER BY price ASC 
-        LIMIT :limit
-    """), {"ticker": ticker, "limit": limit}).fetchall()
-
-    return L2OrderBook(
-        bid_levels=[Level(price=price, qty=qty) for price, qty in bids],
-        ask_levels=[Level(price=price, qty=qty) for price, qty in asks]
-    )
+async def get_orderbook(ticker: str, limit: int = 10):
+    book = books.get(ticker) or OrderBook(ticker)
+    return ORJSONResponse({
+        "bid_levels": level_rows(book.depth(Direction.BUY, limit)),
+        "ask_levels": level_rows(book.depth(Direction.SELL, limit)),
+    })
+
+
+@router.get("/api/v1/public/tickers", response_model=List[TickerSchema])
+async def list_tickers(if_none_match: Optional[str] = Header(default=None)):
+    # Unchanged polls get a 304 without touching the database or re-encoding.
+    body, etag = board.render()
+    if if_none_match is not None and etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.get("/api/v1/public/transactions/{ticker}", response_model=List[TransactionSchema])
-def get_transactions(ticker: str, limit: int = 10, db: Session = Depends(get_db)):
-    return db.query(Transaction).filter(
-        Transaction.ticker == ticker
-    ).order_by(Transaction.timestamp.desc()).limit(limit).all()
+async def get_transactions(
+        ticker: str,
+        limit: int = Query(default=10, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db)
+):
+    query = select(
+        Transaction.ticker, Transaction.amount, Transaction.price, Transaction.timestamp, Transaction.id
+    ).filter(Transaction.ticker == ticker)
+    after = decode_cursor(cursor)
+    if after is not None:
+        query = query.filter(tuple_(Transaction.timestamp, Transaction.id) < after)
+
+    result = await db.execute(query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit))
+    transactions = result.all()
+    headers = None
+    if len(transactions) == limit:
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(transactions[-1].timestamp, transactions[-1].id)}
+    return ORJSONResponse(transaction_rows(transactions), headers=headers)
+
+
+@router.get("/api/v1/public/candles/{ticker}", response_model=List[CandleSchema])
+async def get_candles(
+        ticker: str,
+        interval: CandleInterval = CandleInterval.MINUTE,
+        from_: Optional[datetime] = Query(default=None, alias="from"),
+        to: Optional[datetime] = None,
+        limit: int = Query(default=500, ge=1, le=MAX_CANDLES),
+        db: AsyncSession = Depends(get_read_db)
+):
+    query = select(Candle).filter(Candle.ticker == ticker, Candle.interval == interval.value)
+    if from_ is not None:
+        query = query.filter(Candle.bucket >= bucket_start(naive_utc(from_), interval))
+    if to is not None:
+        query = query.filter(Candle.bucket < naive_utc(to))
+
+    if from_ is None:
+        # Without a start, return the latest `limit` candles.
+        result = await db.execute(query.order_by(Candle.bucket.desc()).limit(limit))
+        candles = reversed(result.scalars().all())
+    else:
+        result = await db.execute(query.order_by(Candle.bucket).limit(limit))
+        candles = result.scalars().all()
+
+    return [
+        CandleSchema(
+            timestamp=candle.bucket, open=candle.open, high=candle.high, low=candle.low,
+            close=candle.close, volume=candle.volume
+        )
+        for candle in candles
+    ]
 
 
 @router.get("/api/v1/balance", response_model=dict)
-def get_balances(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    balances = db.query(Balance).filter(Balance.user_id == user.id).all()
-    return {b.ticker: b.amount for b in balances}
+async def get_balances(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    balances = await db.execute(select(Balance).filter(Balance.user_id == user.id))
+    return {b.ticker: b.amount for b in balances.scalars()}
 
 
 @router.post("/api/v1/order", response_model=CreateOrderResponse)
-def create_order(
+async def create_order(
         order: Union[LimitOrderBody, MarketOrderBody],
+        prefer: Optional[str] = Header(default=None),
         user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
-    instrument = db.query(Instrument).get(order.ticker)
+    instrument = await db.get(Instrument, order.ticker)
     if not instrument:
         raise HTTPException(status_code=404, detail="Instrument not found")
 
+    queued = _respond_async(prefer)
     db_order = Order(
+        id=uuid4(),
         user_id=user.id,
         direction=order.direction,
         ticker=order.ticker,
@@ -107,51 +197,276 @@ def create_order(
 
     db.add(db_order)
     try:
-        db.commit()
+        await enqueue(db, [db_order], notify=queued)
+        await db.commit()
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Order creation failed")
 
-    match_order(db, db_order)
+    if queued:
+        return ORJSONResponse({"success": True, "order_id": db_order.id}, status_code=202, headers=ACCEPTED_HEADERS)
+
+    if await _submit(db, [db_order]) is None:
+        return ORJSONResponse({"success": True, "order_id": db_order.id}, status_code=202)
 
     return CreateOrderResponse(order_id=db_order.id)
 
 
-@router.get("/api/v1/order", response_model=List[Union[LimitOrderBody, MarketOrderBody]])
-def list_orders(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Order).filter(Order.user_id == user.id).all()
+@router.post("/api/v1/orders/batch", response_model=List[BatchOrderResult])
+async def create_orders(
+        orders: OrderBatch,
+        prefer: Optional[str] = Header(default=None),
+        user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    tickers = {order.ticker for order in orders}
+    result = await db.execute(select(Instrument.ticker).filter(Instrument.ticker.in_(tickers)))
+    missing = tickers - set(result.scalars())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Instrument not found: {', '.join(sorted(missing))}")
+
+    db_orders = [
+        Order(
+            id=uuid4(),
+            user_id=user.id,
+            direction=order.direction,
+            ticker=order.ticker,
+            qty=order.qty,
+            price=order.price if isinstance(order, LimitOrderBody) else None,
+            order_type='limit' if isinstance(order, LimitOrderBody) else 'market'
+        )
+        for order in orders
+    ]
+
+    queued = _respond_async(prefer)
+    db.add_all(db_orders)
+    try:
+        await enqueue(db, db_orders, notify=queued)
+        await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Order creation failed")
+
+    pending = [{"order_id": order.id, "status": OrderStatus.NEW.value, "filled": 0} for order in db_orders]
+    if queued:
+        return ORJSONResponse(pending, status_code=202, headers=ACCEPTED_HEADERS)
 
+    results = await _submit(db, db_orders)
+    if results is None:
+        return ORJSONResponse(pending, status_code=202)
 
-@router.get("/api/v1/order/{order_id}", response_model=Union[LimitOrderBody, MarketOrderBody])
-def get_order(order_id: UUID4, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    order = db.query(Order).filter(and_(
+    return [
+        BatchOrderResult(order_id=order.id, status=results[order.id][0], filled=results[order.id][1])
+        for order in db_orders
+    ]
+
+
+@router.get("/api/v1/order", response_model=List[Union[LimitOrderBody, MarketOrderBody]])
+async def list_orders(
+        status: Optional[OrderStatus] = None,
+        ticker: Optional[str] = None,
+        limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    after = decode_cursor(cursor)
+
+    # Terminal orders may have been archived, so both tables are paged with
+    # the same keyset and the two pages merged. One statement reads both from
+    # the same snapshot, so an order the archiver moves shows up only once.
+    tables = [Order] if status in ACTIVE_STATUSES else [Order, OrderArchive]
+    pages = []
+    for table in tables:
+        query = select(
+            table.direction, table.ticker, table.qty, table.price, table.created_at, table.id
+        ).filter(table.user_id == user.id)
+        if status is not None:
+            query = query.filter(table.status == status)
+        if ticker is not None:
+            query = query.filter(table.ticker == ticker)
+        if after is not None:
+            query = query.filter(tuple_(table.created_at, table.id) < after)
+        pages.append(query.order_by(table.created_at.desc(), table.id.desc()).limit(limit))
+
+    merged = union_all(*pages).subquery() if len(pages) > 1 else pages[0].subquery()
+    orders = (await db.execute(
+        select(merged).order_by(merged.c.created_at.desc(), merged.c.id.desc()).limit(limit)
+    )).all()
+    headers = None
+    if len(orders) == limit:
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(orders[-1].created_at, orders[-1].id)}
+    return ORJSONResponse(order_rows(orders), headers=headers)
+
+
+async def _get_user_order(db: AsyncSession, order_id: UUID4, user: User) -> Union[Order, OrderArchive]:
+    result = await db.execute(select(Order).filter(and_(
         Order.id == order_id,
         Order.user_id == user.id
-    )).first()
+    )))
+    order = result.scalar_one_or_none()
+
+    if not order:
+        result = await db.execute(select(OrderArchive).filter(and_(
+            OrderArchive.id == order_id,
+            OrderArchive.user_id == user.id
+        )))
+        order = result.scalar_one_or_none()
 
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 
-@router.delete("/api/v1/order/{order_id}", response_model=dict)
-def cancel_order(order_id: UUID4, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    order = db.query(Order).filter(and_(
-        Order.id == order_id,
-        Order.user_id == user.id
-    )).first()
+@router.get("/api/v1/fills", response_model=List[FillSchema])
+async def list_fills(
+        since: Optional[str] = None,
+        limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    # Oldest first: X-Next-Cursor is the `since` for the next incremental sync.
+    query = select(
+        UserFill.order_id, UserFill.counter_order_id, UserFill.ticker, UserFill.side, UserFill.qty,
+        UserFill.price, UserFill.timestamp, UserFill.xid, UserFill.id
+    ).filter(UserFill.user_id == user.id, UserFill.xid < SYNC_HORIZON)
+    after = decode_seq_cursor(since)
+    if after is not None:
+        query = query.filter(tuple_(UserFill.xid, UserFill.id) > after)
 
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    fills = (await db.execute(query.order_by(UserFill.xid, UserFill.id).limit(limit))).all()
+    cursor = encode_seq_cursor(fills[-1].xid, fills[-1].id) if fills else since
+    return ORJSONResponse(fill_rows(fills), headers={NEXT_CURSOR_HEADER: cursor} if cursor else None)
+
+
+@router.get("/api/v1/order/{order_id}", response_model=OrderState, response_model_exclude_none=True)
+async def get_order(order_id: UUID4, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    return await _get_user_order(db, order_id, user)
+
+
+@router.delete("/api/v1/order/{order_id}", response_model=dict)
+async def cancel_order(order_id: UUID4, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    order = await _get_user_order(db, order_id, user)
 
-    if order.status not in [OrderStatus.NEW, OrderStatus.PARTIALLY_EXECUTED]:
+    if order.status not in [OrderStatus.NEW, OrderStatus.PARTIALLY_EXECUTED] or \
+            not (await matcher.cancel(db, [order]))[order.id]:
         raise HTTPException(status_code=400, detail="Cannot cancel executed order")
 
-    order.status = OrderStatus.CANCELLED
-    db.commit()
     return {"success": True}
 
 
+@router.delete("/api/v1/orders", response_model=List[CancelOrderResult])
+async def cancel_orders(
+        ticker: Optional[str] = None,
+        direction: Optional[Direction] = None,
+        ids: Optional[List[UUID4]] = Query(default=None, max_length=MAX_BATCH_ORDERS),
+        user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    if ticker is None and direction is None and not ids:
+        raise HTTPException(status_code=400, detail="Specify ticker, direction or ids")
+
+    query = select(Order).filter(
+        Order.user_id == user.id,
+        Order.status.in_([OrderStatus.NEW, OrderStatus.PARTIALLY_EXECUTED])
+    )
+    if ticker is not None:
+        query = query.filter(Order.ticker == ticker)
+    if direction is not None:
+        query = query.filter(Order.direction == direction)
+    if ids:
+        query = query.filter(Order.id.in_(ids))
+
+    orders = (await db.execute(query)).scalars().all()
+    results = await matcher.cancel(db, orders) if orders else {}
+    if not ids:
+        return [CancelOrderResult(order_id=order_id, success=success) for order_id, success in results.items()]
+
+    # One result per requested id, in request order. Another user's order
+    # is reported as not found, like a made-up id.
+    requested = list(dict.fromkeys(ids))
+    missing = [order_id for order_id in requested if order_id not in results]
+    statuses = {}
+    if missing:
+        statuses = dict((await db.execute(
+            select(Order.id, Order.status).filter(Order.user_id == user.id, Order.id.in_(missing))
+        )).all())
+        statuses.update((await db.execute(
+            select(OrderArchive.id, OrderArchive.status)
+            .filter(OrderArchive.user_id == user.id, OrderArchive.id.in_(missing))
+        )).all())
+
+    def result(order_id) -> CancelOrderResult:
+        if results.get(order_id):
+            return CancelOrderResult(order_id=order_id, success=True)
+        status = statuses.get(order_id)
+        if order_id in results or (status is not None and status not in ACTIVE_STATUSES):
+            detail = "Order is not active"
+        elif status is None:
+            detail = "Order not found"
+        else:
+            detail = "Order does not match ticker or direction"
+        return CancelOrderResult(order_id=order_id, success=False, detail=detail)
+
+    return [result(order_id) for order_id in requested]
+
+
+@router.websocket("/api/v1/public/ws")
+async def market_data(websocket: WebSocket):
+    await websocket.accept()
+    subscriber = Subscriber(websocket)
+    sender = asyncio.create_task(subscriber.run())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object"})
+                continue
+            tickers = message.get("tickers", [])
+            if not isinstance(tickers, list) or not all(isinstance(ticker, str) for ticker in tickers):
+                await websocket.send_json({"type": "error", "detail": "tickers must be a list of strings"})
+                continue
+            tickers = set(tickers)
+            if message.get("action") == "subscribe":
+                # Every subscribed ticker is held in memory until the
+                # connection closes, so only listed ones are accepted.
+                if len(subscriber.tickers | tickers) > MAX_SUBSCRIPTIONS:
+                    await websocket.send_json({
+                        "type": "error", "detail": f"At most {MAX_SUBSCRIPTIONS} tickers per connection"
+                    })
+                    continue
+                async with read_session() as db:
+                    listed = set((await db.execute(
+                        select(Instrument.ticker).filter(Instrument.ticker.in_(tickers - subscriber.tickers))
+                    )).scalars())
+                unknown = tickers - subscriber.tickers - listed
+                if unknown:
+                    await websocket.send_json({
+                        "type": "error", "detail": f"Unknown tickers: {', '.join(sorted(unknown))}"
+                    })
+                    continue
+                feed.subscribe(subscriber, listed)
+            elif message.get("action") == "unsubscribe":
+                feed.unsubscribe(subscriber, tickers)
+            elif message.get("action") == "orders":
+                # Outcomes of the user's orders accepted with Prefer: respond-async.
+                try:
+                    async with AsyncSessionLocal() as db:
+                        user = await get_current_user(str(message.get("api_key", "")), db)
+                except HTTPException as exc:
+                    await websocket.send_json({"type": "error", "detail": exc.detail})
+                    continue
+                feed.subscribe_orders(subscriber, str(user.id))
+            else:
+                await websocket.send_json({"type": "error", "detail": "Unknown action"})
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        feed.unsubscribe(subscriber, subscriber.tickers)
+        feed.unsubscribe_orders(subscriber)
+        sender.cancel()
+
+
 @router.post("/api/v1/admin/instrument")
 async def add_instrument(
         instrument: InstrumentSchema,
@@ -178,22 +493,27 @@ async def add_instrument(
 
 
 @router.delete("/api/v1/admin/instrument/{ticker}", response_model=dict)
-def delete_instrument(ticker: str, admin: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    instrument = db.query(Instrument).get(ticker)
+async def delete_instrument(ticker: str, admin: User = Depends(get_admin_user), db: AsyncSession = Depends(get_db)):
+    instrument = await db.get(Instrument, ticker)
     if not instrument:
         raise HTTPException(status_code=404, detail="Instrument not found")
 
-    db.delete(instrument)
-    db.commit()
+    await db.delete(instrument)
+    await db.commit()
     return {"success": True}
 
 
-@router.post("/api/v1/admin/balance/deposit", response_model=dict)
-def deposit(data: BalanceOperation, admin: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    balance = db.query(Balance).filter(and_(
+async def _get_balance(db: AsyncSession, data: BalanceOperation) -> Balance:
+    result = await db.execute(select(Balance).filter(and_(
         Balance.user_id == data.user_id,
         Balance.ticker == data.ticker
-    )).first()
+    )).with_for_update())
+    return result.scalar_one_or_none()
+
+
+@router.post("/api/v1/admin/balance/deposit", response_model=dict)
+async def deposit(data: BalanceOperation, admin: User = Depends(get_admin_user), db: AsyncSession = Depends(get_db)):
+    balance = await _get_balance(db, data)
 
     if not balance:
         balance = Balance(
@@ -205,32 +525,71 @@ def deposit(data: BalanceOperation, admin: User = Depends(get_admin_user), db: S
         balance.amount += data.amount
 
     db.add(balance)
-    db.commit()
+    await db.commit()
     return {"success": True}
 
 
 @router.post("/api/v1/admin/balance/withdraw", response_model=dict)
-def withdraw(data: BalanceOperation, admin: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    balance = db.query(Balance).filter(and_(
-        Balance.user_id == data.user_id,
-        Balance.ticker == data.ticker
-    )).first()
+async def withdraw(data: BalanceOperation, admin: User = Depends(get_admin_user), db: AsyncSession = Depends(get_db)):
+    balance = await _get_balance(db, data)
 
     if not balance or balance.amount < data.amount:
         raise HTTPException(status_code=400, detail="Insufficient funds")
 
     balance.amount -= data.amount
     db.add(balance)
-    db.commit()
+    await db.commit()
     return {"success": True}
 
 
+# Bulk endpoints take a text/csv (with a header row) or application/x-ndjson
+# body. Invalid rows are reported by number and the valid ones applied.
+@router.post("/api/v1/admin/balance/bulk", response_model=BulkBalanceResult)
+async def bulk_balance(request: Request, admin: User = Depends(get_admin_user), db: AsyncSession = Depends(get_db)):
+    operations, errors = parse_rows(await request.body(), request.headers.get("content-type", ""), BulkBalanceOperation)
+    rejected = []
+    if operations:
+        try:
+            rejected = await apply_balance_operations(db, operations)
+            await db.commit()
+        except (SQLAlchemyError, asyncpg.PostgresError):
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Bulk balance update failed")
+
+    return {
+        "applied": len(operations) - len(rejected),
+        "errors": sorted(errors + rejected, key=lambda error: error["row"]),
+    }
+
+
+@router.post("/api/v1/admin/user/bulk", response_model=BulkUsersResult)
+async def bulk_register(request: Request, admin: User = Depends(get_admin_user), db: AsyncSession = Depends(get_db)):
+    users, errors = parse_rows(await request.body(), request.headers.get("content-type", ""), NewUser)
+    created = []
+    if users:
+        try:
+            created, rejected = await create_users(db, users)
+            await db.commit()
+        except (SQLAlchemyError, asyncpg.PostgresError):
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Bulk registration failed")
+        errors = sorted(errors + rejected, key=lambda error: error["row"])
+
+    return {"users": created, "errors": errors}
+
+
 @router.delete("/api/v1/admin/user/{user_id}", response_model=UserResponse)
-def delete_user(user_id: UUID4, admin: User = Depends(get_admin_user), db: Session = Depends(get_db)):
-    user = db.query(User).get(user_id)
+async def delete_user(user_id: UUID4, admin: User = Depends(get_admin_user), db: AsyncSession = Depends(get_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    db.delete(user)
-    db.commit()
-    return user
+    await db.delete(user)
+    await db.commit()
+    api_key_cache.pop(user.api_key)
+    return {
+        "id": str(user.id),
+        "name": user.name,
+        "role": user.role.value,
+        "api_key": user.api_key
+    }
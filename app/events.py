@@ -0,0 +1,6 @@
+# Journal event kinds. Replaying rest/fill/cancel in sequence order rebuilds a
+# book; accept is kept for auditing.
+ACCEPT = "accept"
+REST = "rest"
+FILL = "fill"
+CANCEL = "cancel"
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict, deque
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Set, Tuple
+
+from fastapi import WebSocket
+
+from app.orderbook import Fill, OrderBook, books
+from app.schemas import Direction
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING_LEVELS = 1000
+MAX_PENDING_TRADES = 500
+# Tickers one connection may subscribe to at a time.
+MAX_SUBSCRIPTIONS = int(os.getenv("FEED_MAX_SUBSCRIPTIONS", 100))
+
+
+def _levels(pairs: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    return [[price, qty] for price, qty in pairs]
+
+
+class Subscriber:
+    """One WebSocket connection.
+
+    Publishing only updates the pending state below and never awaits, so a
+    slow client accumulates coalesced level updates instead of blocking the
+    matcher. A client that falls too far behind is resynced with a snapshot.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.tickers: Set[str] = set()
+        self._snapshots: Set[str] = set()
+        self._levels: Dict[str, Dict[Tuple[Direction, int], int]] = defaultdict(dict)
+        self._trades: Dict[str, deque] = {}
+        self._dropped: Dict[str, int] = defaultdict(int)
+        # Outcomes of the user's queued orders, once authenticated.
+        self.user_id = None
+        self._orders: deque = deque(maxlen=MAX_PENDING_TRADES)
+        self._ready = asyncio.Event()
+
+    def push_snapshot(self, ticker: str):
+        self._snapshots.add(ticker)
+        self._levels.pop(ticker, None)
+        self._ready.set()
+
+    def push_levels(self, ticker: str, changes: List[Tuple[Direction, int, int]]):
+        if ticker in self._snapshots:
+            return
+        pending = self._levels[ticker]
+        for direction, price, qty in changes:
+            pending[(direction, price)] = qty
+        if len(pending) > MAX_PENDING_LEVELS:
+            self.push_snapshot(ticker)
+        self._ready.set()
+
+    def push_trades(self, ticker: str, trades: List[dict]):
+        pending = self._trades.get(ticker)
+        if pending is None:
+            pending = self._trades[ticker] = deque(maxlen=MAX_PENDING_TRADES)
+        overflow = len(pending) + len(trades) - MAX_PENDING_TRADES
+        if overflow > 0:
+            self._dropped[ticker] += overflow
+        pending.extend(trades)
+        self._ready.set()
+
+    def push_order(self, message: dict):
+        self._orders.append(message)
+        self._ready.set()
+
+    def _take(self) -> List[dict]:
+        messages = list(self._orders)
+        self._orders.clear()
+        for ticker in self._snapshots:
+            book = books.get(ticker) or OrderBook(ticker)
+            messages.append({
+                "type": "snapshot",
+                "ticker": ticker,
+                "seq": feed.seq.get(ticker, 0),
+                "bid_levels": _levels(book.depth(Direction.BUY)),
+                "ask_levels": _levels(book.depth(Direction.SELL)),
+            })
+        self._snapshots.clear()
+
+        for ticker, pending in self._levels.items():
+            if pending:
+                messages.append({
+                    "type": "levels",
+                    "ticker": ticker,
+                    "seq": feed.seq.get(ticker, 0),
+                    "bid_levels": _levels(sorted(
+                        ((price, qty) for (direction, price), qty in pending.items() if direction == Direction.BUY),
+                        reverse=True
+                    )),
+                    "ask_levels": _levels(sorted(
+                        (price, qty) for (direction, price), qty in pending.items() if direction == Direction.SELL
+                    )),
+                })
+        self._levels.clear()
+
+        for ticker, pending in self._trades.items():
+            if pending:
+                messages.append({
+                    "type": "trades",
+                    "ticker": ticker,
+                    "seq": feed.seq.get(ticker, 0),
+                    "trades": list(pending),
+                    "dropped": self._dropped.pop(ticker, 0),
+                })
+        self._trades.clear()
+        return messages
+
+    async def run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            for message in self._take():
+                await self.websocket.send_json(message)
+
+
+class MarketDataFeed:
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        self.seq: Dict[str, int] = defaultdict(int)
+        # Receive every ticker's updates, e.g. the streams a matcher process
+        # forwards to the HTTP workers.
+        self.listeners: List = []
+        self.users: Dict[str, Set[Subscriber]] = defaultdict(set)
+
+    def subscribe(self, subscriber: Subscriber, tickers: Iterable[str]):
+        for ticker in tickers:
+            subscriber.tickers.add(ticker)
+            self.subscribers[ticker].add(subscriber)
+            subscriber.push_snapshot(ticker)
+
+    def unsubscribe(self, subscriber: Subscriber, tickers: Iterable[str]):
+        for ticker in list(tickers):
+            subscriber.tickers.discard(ticker)
+            subscribers = self.subscribers.get(ticker)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[ticker]
+
+    def subscribe_orders(self, subscriber: Subscriber, user_id: str):
+        self.unsubscribe_orders(subscriber)
+        subscriber.user_id = user_id
+        self.users[user_id].add(subscriber)
+
+    def unsubscribe_orders(self, subscriber: Subscriber):
+        subscribers = self.users.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.users[subscriber.user_id]
+        subscriber.user_id = None
+
+    def notify_user(self, user_id: str, message: dict):
+        for subscriber in self.users.get(user_id, ()):
+            subscriber.push_order(message)
+
+    def publish(self, book: OrderBook, fills: List[Fill] = (), timestamp: datetime = None):
+        trades = [
+            {"ticker": book.ticker, "amount": fill.qty, "price": fill.price, "timestamp": timestamp.isoformat()}
+            for fill in fills
+        ]
+        self.broadcast(book.ticker, book.drain_changes(), trades)
+
+    def broadcast(self, ticker: str, changes: List[Tuple[Direction, int, int]], trades: List[dict]):
+        if not changes and not trades:
+            return
+        self.seq[ticker] += 1
+
+        for subscriber in chain(self.subscribers.get(ticker, ()), self.listeners):
+            if changes:
+                subscriber.push_levels(ticker, changes)
+            if trades:
+                subscriber.push_trades(ticker, trades)
+
+    def resync(self, book: OrderBook):
+        book.drain_changes()
+        self.seq[book.ticker] += 1
+        for subscriber in chain(self.subscribers.get(book.ticker, ()), self.listeners):
+            subscriber.push_snapshot(book.ticker)
+
+
+feed = MarketDataFeed()
@@ -0,0 +1,142 @@
+import os
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import select, insert, delete, exists, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.events import CANCEL, FILL, REST
+from app.models import Order, OrderEvent, BookSnapshot, QueuedOrder
+from app.feed import feed
+from app.orderbook import OrderBook, books, get_book
+from app.schemas import ACTIVE_STATUSES, Direction
+
+SNAPSHOT_INTERVAL = float(os.getenv("JOURNAL_SNAPSHOT_INTERVAL", 60))
+
+# Books that may have diverged from the database after a failed settlement.
+# Rebuilt on next use, under the ticker lock, and never snapshotted meanwhile.
+stale_books: Set[str] = set()
+
+
+def resting_orders_query():
+    # Orders still in the queue have never been matched, so they are not in
+    # any book yet; the queue consumer matches them after recovery.
+    return select(Order).filter(
+        Order.order_type == 'limit',
+        Order.status.in_(ACTIVE_STATUSES),
+        ~exists().where(QueuedOrder.order_id == Order.id)
+    ).order_by(Order.created_at, Order.id)
+
+
+def add_order(book: OrderBook, order: Order):
+    book.add(order.id, order.user_id, order.direction, order.price, order.qty, order.filled)
+
+
+async def append_events(db: AsyncSession, events: List[dict], timestamp: datetime) -> Optional[int]:
+    if not events:
+        return None
+    result = await db.execute(
+        insert(OrderEvent).values([{**event, "created_at": timestamp} for event in events]).returning(OrderEvent.seq)
+    )
+    return max(result.scalars())
+
+
+def apply_event(book: OrderBook, kind: str, order_id: UUID, payload: dict):
+    if kind == REST:
+        book.add(
+            order_id, UUID(payload["user_id"]), Direction(payload["direction"]),
+            payload["price"], payload["qty"], payload["qty"] - payload["remaining"]
+        )
+    elif kind == FILL:
+        book.reduce(UUID(payload["maker_id"]), payload["qty"])
+    elif kind == CANCEL:
+        book.cancel(order_id)
+
+
+def snapshot_payload(book: OrderBook) -> list:
+    return [
+        [str(resting.id), str(resting.user_id), resting.direction.value, resting.price, resting.qty, resting.remaining]
+        for resting in book.resting()
+    ]
+
+
+def restore(ticker: str, payload: list) -> OrderBook:
+    book = OrderBook(ticker)
+    for order_id, user_id, direction, price, qty, remaining in payload:
+        book.add(UUID(order_id), UUID(user_id), Direction(direction), price, qty, qty - remaining)
+    return book
+
+
+async def recover(db: AsyncSession, owns: Callable[[str], bool], ticker: Optional[str] = None) -> Dict[str, OrderBook]:
+    recovered = {}
+
+    latest = select(BookSnapshot).distinct(BookSnapshot.ticker).order_by(BookSnapshot.ticker, BookSnapshot.seq.desc())
+    legacy = resting_orders_query()
+    if ticker is not None:
+        latest = latest.filter(BookSnapshot.ticker == ticker)
+        legacy = legacy.filter(Order.ticker == ticker)
+    snapshots = [snapshot for snapshot in (await db.execute(latest)).scalars() if owns(snapshot.ticker)]
+    for snapshot in snapshots:
+        book = recovered[snapshot.ticker] = restore(snapshot.ticker, snapshot.payload)
+        book.seq = book.snapshot_seq = snapshot.seq
+
+    if snapshots:
+        tail = await db.execute(select(OrderEvent).filter(
+            OrderEvent.ticker.in_(list(recovered)),
+            OrderEvent.seq > min(snapshot.seq for snapshot in snapshots)
+        ).order_by(OrderEvent.seq))
+        for event in tail.scalars():
+            book = recovered[event.ticker]
+            if event.seq > book.seq:
+                apply_event(book, event.kind, event.order_id, event.payload)
+                book.seq = event.seq
+
+    # A ticker that has never been snapshotted is rebuilt from the orders
+    # table, which is updated in the same transaction as the journal.
+    head = (await db.execute(select(func.coalesce(func.max(OrderEvent.seq), 0)))).scalar_one()
+    result = await db.execute(legacy.filter(Order.ticker.not_in(list(recovered))))
+    for order in result.scalars():
+        if owns(order.ticker):
+            book = recovered.get(order.ticker)
+            if book is None:
+                book = recovered[order.ticker] = OrderBook(order.ticker)
+                book.seq = head
+            add_order(book, order)
+
+    for book in recovered.values():
+        book.drain_changes()
+    return recovered
+
+
+async def load_books(db: AsyncSession, owns: Callable[[str], bool] = lambda ticker: True):
+    books.clear()
+    books.update(await recover(db, owns))
+
+
+async def reload_book(db: AsyncSession, ticker: str) -> OrderBook:
+    book = books[ticker] = (await recover(db, lambda owned: True, ticker)).get(ticker) or OrderBook(ticker)
+    return book
+
+
+async def current_book(db: AsyncSession, ticker: str) -> OrderBook:
+    if ticker not in stale_books:
+        return get_book(ticker)
+    book = await reload_book(db, ticker)
+    stale_books.discard(ticker)
+    feed.resync(book)
+    return book
+
+
+async def write_snapshots(db: AsyncSession, snapshots: Iterable[tuple]):
+    # Takes (ticker, seq, payload) captured while the book could not change,
+    # and keeps only the newest snapshot per ticker.
+    snapshots = list(snapshots)
+    if not snapshots:
+        return
+    await db.execute(insert(BookSnapshot).values([
+        {"ticker": ticker, "seq": seq, "payload": payload, "created_at": datetime.utcnow()}
+        for ticker, seq, payload in snapshots
+    ]))
+    for ticker, seq, _ in snapshots:
+        await db.execute(delete(BookSnapshot).where(BookSnapshot.ticker == ticker, BookSnapshot.seq < seq))
@@ -1,13 +1,27 @@
+import asyncio
+import time
 from urllib.request import Request
 
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
-from app.database import engine, Base
+from app.archive import archive_periodically
+from app.auth import api_key_cache, listen_for_invalidations
+from app.database import DB_REPLICA_HOST, engine, read_engine
 from app.endpoints import router as api_router
+from app.matcher import check_topology, matcher
+from app.order_queue import listen_for_outcomes
+from app.ratelimit import MARKET_DATA, endpoint_class, rate_limit, shed_reason
+from app.replica import monitor_replica_lag
+from app.startup import check_schema, warm_pools
+from app.tickers import board
+from app.metrics import REQUEST_LATENCY, REQUESTS, render
+from app.tracing import PROFILE_TOKEN, SQL_TRACE, SQL_TRACE_SLOW_MS, RequestTrace, Sampler, current_trace, \
+    instrument, log_slow, server_timing
+from prometheus_client import CONTENT_TYPE_LATEST
 import logging
 from fastapi.security import HTTPBearer
 
@@ -26,16 +40,37 @@ security_scheme = HTTPBearer(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    app.state.ready = False
+    check_topology()
+    await check_schema()
+    await warm_pools()
+
+    await matcher.start()
+    await board.start()
+
+    invalidation_listener = asyncio.create_task(listen_for_invalidations())
+    archiver = asyncio.create_task(archive_periodically())
+    replica_monitor = asyncio.create_task(monitor_replica_lag())
+    outcome_listener = asyncio.create_task(listen_for_outcomes())
 
     logger = logging.getLogger("uvicorn.access")
     logger.info("Application startup complete")
+    app.state.ready = True
 
     yield
 
+    # Fail readiness first, so no new traffic is routed here while shutting down.
+    app.state.ready = False
     logger.info("Application shutdown")
+    invalidation_listener.cancel()
+    archiver.cancel()
+    replica_monitor.cancel()
+    outcome_listener.cancel()
+    await board.close()
+    await matcher.close()
     await engine.dispose()
+    if DB_REPLICA_HOST:
+        await read_engine.dispose()
 
 
 app = FastAPI(
@@ -86,9 +121,95 @@ async def global_exception_handler(request: Request, call_next):
         )
 
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    endpoint = endpoint_class(request.url.path)
+    if endpoint is None:
+        return await call_next(request)
+
+    headers = {
+        "Access-Control-Allow-Headers": "Authorization, Content-Type",
+        "Access-Control-Allow-Origin": "*"
+    }
+    # Market data is served from memory and the read pool, so it is never shed.
+    if endpoint != MARKET_DATA and shed_reason() is not None:
+        return JSONResponse(
+            status_code=503, content={"detail": "Server overloaded"}, headers={**headers, "Retry-After": "1"}
+        )
+
+    # Keys are bucketed by user once authenticated; unknown keys share their
+    # client's bucket, so rotating made-up keys does not escape the limit.
+    api_key = request.headers.get("Authorization", "").removeprefix("TOKEN ").strip()
+    cached = api_key_cache.get(api_key) if api_key else None
+    identity = f"user:{cached[0]}" if cached else f"addr:{request.client.host if request.client else 'unknown'}"
+    retry_after = await rate_limit(endpoint, identity)
+    if retry_after is not None:
+        return JSONResponse(
+            status_code=429, content={"detail": "Rate limit exceeded"},
+            headers={**headers, "Retry-After": str(retry_after)}
+        )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Labelled by route template so path parameters do not create new series.
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    REQUEST_LATENCY.labels(request.method, path).observe(time.perf_counter() - started)
+    REQUESTS.labels(request.method, path, response.status_code).inc()
+    return response
+
+
+async def trace_requests(request: Request, call_next):
+    trace = RequestTrace()
+    token = current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        if PROFILE_TOKEN and request.headers.get("X-Profile") == PROFILE_TOKEN:
+            with Sampler() as sampler:
+                response = await call_next(request)
+            logger.info("Profile of %s %s\n%s", request.method, request.url.path, sampler.report())
+        else:
+            response = await call_next(request)
+    finally:
+        current_trace.reset(token)
+
+    total = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing(trace, total)
+    response.headers["X-DB-Queries"] = str(len(trace.statements))
+    if total * 1000 >= SQL_TRACE_SLOW_MS:
+        log_slow(request.method, request.url.path, trace, total)
+    return response
+
+
+if SQL_TRACE or PROFILE_TOKEN:
+    instrument(engine)
+    if DB_REPLICA_HOST:
+        # Otherwise it shares engine's, whose listeners already see its statements.
+        instrument(read_engine)
+    app.middleware("http")(trace_requests)
+
+
 app.include_router(api_router)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    # Startup has finished and, with matcher processes, every shard's books are mirrored here.
+    if not getattr(app.state, "ready", False) or not matcher.ready():
+        return JSONResponse(status_code=503, content={"status": "not ready"})
+    return {"status": "ready"}
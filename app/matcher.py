@@ -0,0 +1,460 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from itertools import count
+from typing import Callable, Dict, List, Tuple
+from uuid import UUID
+from zlib import crc32
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, engine
+from app import journal
+from app.dependencies import match_orders
+from app.events import CANCEL
+from app.feed import feed
+from app.metrics import process_exited
+from app.models import Order
+from app.order_queue import OrderQueueConsumer, claim
+from app.orderbook import OrderBook, books, get_book
+from app.startup import check_schema
+from app.schemas import ACTIVE_STATUSES, Direction, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+MATCHER_SHARDS = int(os.getenv("MATCHER_SHARDS", 0))
+MATCHER_SOCKET_DIR = os.getenv("MATCHER_SOCKET_DIR", "/tmp/mstock")
+MATCHER_TIMEOUT = float(os.getenv("MATCHER_TIMEOUT", 30))
+# Worker count of gunicorn or uvicorn when not given on the command line.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+# A worker that stops reading its event stream is disconnected and resyncs on reconnect.
+MAX_STREAM_BUFFER = 16 * 1024 * 1024
+
+
+def shard_for(ticker: str, shards: int = MATCHER_SHARDS) -> int:
+    # Rendezvous hashing: changing the shard count only moves the tickers
+    # whose winning shard was added or removed.
+    return max(range(shards), key=lambda shard: crc32(f"{shard}:{ticker}".encode()))
+
+
+def socket_path(shard: int) -> str:
+    return os.path.join(MATCHER_SOCKET_DIR, f"matcher-{shard}.sock")
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def _by_ticker(orders: List[Order]) -> Dict[str, List[Order]]:
+    groups = defaultdict(list)
+    for order in orders:
+        groups[order.ticker].append(order)
+    return groups
+
+
+def _book_levels(book: OrderBook) -> dict:
+    return {
+        "bid_levels": [[price, qty] for price, qty in book.depth(Direction.BUY)],
+        "ask_levels": [[price, qty] for price, qty in book.depth(Direction.SELL)],
+    }
+
+
+def check_topology():
+    # The in-process matcher owns every book, so only one worker may run it.
+    if not MATCHER_SHARDS and WEB_CONCURRENCY > 1:
+        raise RuntimeError(f"MATCHER_SHARDS=0 needs a single worker, not WEB_CONCURRENCY={WEB_CONCURRENCY}")
+
+
+class LocalMatcher:
+    """Matches in this process, serially per ticker."""
+
+    def __init__(self, owns: Callable[[str], bool] = lambda ticker: True):
+        self.owns = owns
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._snapshotter = None
+        self._in_flight = 0
+        self.queue = OrderQueueConsumer(self._locks, owns)
+
+    def queue_depth(self) -> int:
+        # Submits and cancels running or waiting for a ticker lock.
+        return self._in_flight
+
+    def ready(self) -> bool:
+        return self._snapshotter is not None
+
+    async def start(self):
+        async with AsyncSessionLocal() as db:
+            await journal.load_books(db, self.owns)
+        # Checkpoint right away so the next start replays only what happens from now on.
+        await self.snapshot()
+        self._snapshotter = asyncio.create_task(self._snapshot_periodically())
+        self.queue.start()
+
+    async def close(self):
+        await self.queue.close()
+        if self._snapshotter is not None:
+            self._snapshotter.cancel()
+
+    async def snapshot(self):
+        snapshots = []
+        for book in list(books.values()):
+            if book.seq > book.snapshot_seq:
+                async with self._locks[book.ticker]:
+                    # Skip a book that is stale or was replaced by a reload meanwhile.
+                    if book.ticker not in journal.stale_books and books.get(book.ticker) is book:
+                        snapshots.append((book, book.seq, journal.snapshot_payload(book)))
+
+        async with AsyncSessionLocal() as db:
+            await journal.write_snapshots(db, ((book.ticker, seq, payload) for book, seq, payload in snapshots))
+            await db.commit()
+        for book, seq, _ in snapshots:
+            book.snapshot_seq = seq
+
+    async def _snapshot_periodically(self):
+        while True:
+            await asyncio.sleep(journal.SNAPSHOT_INTERVAL)
+            try:
+                await self.snapshot()
+            except SQLAlchemyError as exc:
+                logger.error(f"Book snapshot failed: {exc}")
+
+    async def submit(self, db: AsyncSession, orders: List[Order]) -> Dict[UUID, Tuple[OrderStatus, int]]:
+        self._in_flight += 1
+        try:
+            for ticker, group in _by_ticker(orders).items():
+                async with self._locks[ticker]:
+                    claimed = await claim(db, [order.id for order in group])
+                    if claimed:
+                        await match_orders(db, [order for order in group if order.id in claimed])
+                    else:
+                        await db.commit()
+                    # Already matched from the queue, e.g. after an earlier submit timed out.
+                    for order in group:
+                        if order.id not in claimed:
+                            await db.refresh(order)
+        finally:
+            self._in_flight -= 1
+        return {order.id: (order.status, order.filled) for order in orders}
+
+    async def cancel(self, db: AsyncSession, orders: List[Order]) -> Dict[UUID, bool]:
+        self._in_flight += 1
+        try:
+            return await self._cancel(db, orders)
+        finally:
+            self._in_flight -= 1
+
+    async def _cancel(self, db: AsyncSession, orders: List[Order]) -> Dict[UUID, bool]:
+        cancelled = set()
+        for ticker, group in _by_ticker(orders).items():
+            async with self._locks[ticker]:
+                # Only orders still active when the row is updated are cancelled;
+                # any of them may have been filled since the caller read it.
+                result = await db.execute(
+                    update(Order)
+                    .where(Order.id.in_([order.id for order in group]), Order.status.in_(ACTIVE_STATUSES))
+                    .values(status=OrderStatus.CANCELLED)
+                    .returning(Order.id)
+                    .execution_options(synchronize_session="fetch")
+                )
+                ids = set(result.scalars())
+                await claim(db, ids)
+                book = await journal.current_book(db, ticker)
+                events = [
+                    {"ticker": ticker, "kind": CANCEL, "order_id": order_id,
+                     "payload": {"remaining": book.remaining(order_id)}}
+                    for order_id in ids
+                ]
+                seq = await journal.append_events(db, events, datetime.utcnow())
+                await db.commit()
+
+                for order_id in ids:
+                    book.cancel(order_id)
+                if seq is not None:
+                    book.seq = seq
+                feed.publish(book)
+                cancelled |= ids
+        return {order.id: order.id in cancelled for order in orders}
+
+
+class _StreamListener:
+    """Forwards feed updates of a matcher process to one HTTP worker."""
+
+    def __init__(self, writer: asyncio.StreamWriter, owns: Callable[[str], bool]):
+        self.writer = writer
+        self.owns = owns
+
+    def _send(self, message: dict):
+        if self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_STREAM_BUFFER:
+            logger.warning("Matcher event stream is not being read, disconnecting")
+            self.writer.close()
+            return
+        self.writer.write(_encode(message))
+
+    def push_snapshot(self, ticker: str):
+        self._send({"event": "snapshot", "full": False, "books": {ticker: _book_levels(get_book(ticker))}})
+
+    def push_levels(self, ticker: str, changes: List[Tuple[Direction, int, int]]):
+        self._send({
+            "event": "levels",
+            "ticker": ticker,
+            "changes": [[direction.value, price, qty] for direction, price, qty in changes],
+        })
+
+    def push_trades(self, ticker: str, trades: List[dict]):
+        self._send({"event": "trades", "ticker": ticker, "trades": trades})
+
+    def send_full_snapshot(self):
+        self._send({
+            "event": "snapshot",
+            "full": True,
+            "books": {ticker: _book_levels(book) for ticker, book in books.items() if self.owns(ticker)},
+        })
+
+
+class MatcherServer:
+    """Owns the books of the tickers hashed to one shard."""
+
+    def __init__(self, shard: int, shards: int = MATCHER_SHARDS):
+        self.shard = shard
+        self.shards = shards
+        self.matcher = LocalMatcher(owns=self.owns)
+
+    def owns(self, ticker: str) -> bool:
+        return shard_for(ticker, self.shards) == self.shard
+
+    async def serve(self):
+        await self.matcher.start()
+        path = socket_path(self.shard)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)
+
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        logger.info(f"Matcher {self.shard}/{self.shards} listening on {path} with {len(books)} books")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        listener = None
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message["op"] == "subscribe":
+                    if listener is None:
+                        listener = _StreamListener(writer, self.owns)
+                        feed.listeners.append(listener)
+                    listener.send_full_snapshot()
+                    continue
+
+                task = asyncio.create_task(self._dispatch(message, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as exc:
+            logger.warning(f"Matcher connection dropped: {exc}")
+        finally:
+            if listener is not None:
+                feed.listeners.remove(listener)
+            writer.close()
+
+    async def _dispatch(self, message: dict, writer: asyncio.StreamWriter):
+        try:
+            handler = {"submit": self.submit, "cancel": self.cancel}[message["op"]]
+            response = {"id": message["id"], "result": await handler(**message["args"])}
+        except HTTPException as exc:
+            response = {"id": message["id"], "error": {"status_code": exc.status_code, "detail": exc.detail}}
+        except Exception as exc:
+            logger.error(f"Matcher request failed: {exc}", exc_info=True)
+            response = {"id": message["id"], "error": {"status_code": 500, "detail": "Matcher error"}}
+
+        if not writer.is_closing():
+            writer.write(_encode(response))
+
+    async def _load_orders(self, db: AsyncSession, order_ids: List[str]) -> List[Order]:
+        ids = [UUID(order_id) for order_id in order_ids]
+        result = await db.execute(select(Order).filter(Order.id.in_(ids)))
+        orders = {order.id: order for order in result.scalars()}
+        if len(orders) != len(set(ids)):
+            raise HTTPException(status_code=404, detail="Order not found")
+        if not all(self.owns(order.ticker) for order in orders.values()):
+            raise HTTPException(status_code=409, detail="Ticker is owned by another matcher")
+        # Keep the caller's order: it is the submission sequence within a batch.
+        return [orders[order_id] for order_id in dict.fromkeys(ids)]
+
+    async def submit(self, order_ids: List[str]) -> dict:
+        async with AsyncSessionLocal() as db:
+            results = await self.matcher.submit(db, await self._load_orders(db, order_ids))
+            return {str(order_id): [status.value, filled] for order_id, (status, filled) in results.items()}
+
+    async def cancel(self, order_ids: List[str]) -> dict:
+        async with AsyncSessionLocal() as db:
+            results = await self.matcher.cancel(db, await self._load_orders(db, order_ids))
+            return {str(order_id): cancelled for order_id, cancelled in results.items()}
+
+
+class _ShardConnection:
+    def __init__(self, shard: int, shards: int):
+        self.shard = shard
+        self.shards = shards
+        self.writer = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.ids = count()
+        # Connected and holding the shard's books.
+        self.synced = False
+
+    async def request(self, op: str, **args) -> dict:
+        if self.writer is None or self.writer.is_closing():
+            raise HTTPException(status_code=503, detail="Matcher unavailable")
+
+        request_id = next(self.ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.writer.write(_encode({"id": request_id, "op": op, "args": args}))
+            await self.writer.drain()
+            response = await asyncio.wait_for(future, MATCHER_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Matcher timeout")
+        except ConnectionError:
+            raise HTTPException(status_code=503, detail="Matcher unavailable")
+        finally:
+            self.pending.pop(request_id, None)
+
+        if "error" in response:
+            raise HTTPException(**response["error"])
+        return response["result"]
+
+    async def run(self, retry_interval: float = 1):
+        while True:
+            try:
+                reader, self.writer = await asyncio.open_unix_connection(socket_path(self.shard))
+            except OSError as exc:
+                logger.warning(f"Cannot connect to matcher {self.shard}: {exc}")
+                await asyncio.sleep(retry_interval)
+                continue
+
+            try:
+                self.writer.write(_encode({"op": "subscribe"}))
+                while line := await reader.readline():
+                    message = json.loads(line)
+                    if "event" in message:
+                        self._on_event(message)
+                    else:
+                        future = self.pending.get(message["id"])
+                        if future is not None and not future.done():
+                            future.set_result(message)
+            except (ConnectionError, ValueError) as exc:
+                logger.warning(f"Matcher {self.shard} connection dropped: {exc}")
+            finally:
+                self.synced = False
+                self.writer.close()
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError())
+            await asyncio.sleep(retry_interval)
+
+    def _on_event(self, message: dict):
+        event = message["event"]
+        if event == "snapshot":
+            tickers = set(message["books"])
+            if message["full"]:
+                tickers.update(ticker for ticker in books if shard_for(ticker, self.shards) == self.shard)
+            for ticker in tickers:
+                book = books[ticker] = OrderBook(ticker)
+                levels = message["books"].get(ticker, {})
+                for price, qty in levels.get("bid_levels", ()):
+                    book.set_level(Direction.BUY, price, qty)
+                for price, qty in levels.get("ask_levels", ()):
+                    book.set_level(Direction.SELL, price, qty)
+                feed.resync(book)
+            if message["full"]:
+                self.synced = True
+        elif event == "levels":
+            book = get_book(message["ticker"])
+            changes = [(Direction(direction), price, qty) for direction, price, qty in message["changes"]]
+            for direction, price, qty in changes:
+                book.set_level(direction, price, qty)
+            feed.broadcast(book.ticker, changes, [])
+        elif event == "trades":
+            feed.broadcast(message["ticker"], [], message["trades"])
+
+
+class RemoteMatcher:
+    """Forwards orders to the matcher process owning their ticker.
+
+    The worker's books are L2 mirrors kept up to date from the matchers'
+    event streams, so order book reads and the WebSocket feed stay local.
+    """
+
+    def __init__(self, shards: int = MATCHER_SHARDS):
+        self.connections = [_ShardConnection(shard, shards) for shard in range(shards)]
+        self._tasks = []
+
+    async def start(self):
+        books.clear()
+        self._tasks = [asyncio.create_task(connection.run()) for connection in self.connections]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def queue_depth(self) -> int:
+        # Requests this worker has waiting on the matcher processes.
+        return sum(len(connection.pending) for connection in self.connections)
+
+    def ready(self) -> bool:
+        return all(connection.synced for connection in self.connections)
+
+    async def _request(self, op: str, orders: List[Order]) -> dict:
+        by_shard = defaultdict(list)
+        for order in orders:
+            by_shard[shard_for(order.ticker, len(self.connections))].append(str(order.id))
+
+        results = {}
+        for response in await asyncio.gather(*(
+            self.connections[shard].request(op, order_ids=order_ids) for shard, order_ids in by_shard.items()
+        )):
+            results.update((UUID(order_id), result) for order_id, result in response.items())
+        return results
+
+    async def submit(self, db: AsyncSession, orders: List[Order]) -> Dict[UUID, Tuple[OrderStatus, int]]:
+        results = await self._request("submit", orders)
+        return {order_id: (OrderStatus(status), filled) for order_id, (status, filled) in results.items()}
+
+    async def cancel(self, db: AsyncSession, orders: List[Order]) -> Dict[UUID, bool]:
+        return await self._request("cancel", orders)
+
+
+matcher = RemoteMatcher() if MATCHER_SHARDS else LocalMatcher()
+
+
+async def _serve(shard: int):
+    try:
+        await check_schema()
+        await MatcherServer(shard).serve()
+    finally:
+        await engine.dispose()
+        process_exited(os.getpid())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the matching engine for one ticker shard")
+    parser.add_argument("--shard", type=int, required=True)
+    args = parser.parse_args()
+
+    if not 0 <= args.shard < MATCHER_SHARDS:
+        parser.error(f"--shard must be in [0, MATCHER_SHARDS={MATCHER_SHARDS})")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    asyncio.run(_serve(args.shard))
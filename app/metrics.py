@@ -0,0 +1,128 @@
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.orderbook import books
+from app.schemas import Direction
+
+# Set for gunicorn and the matcher processes (see docker/init.sh): every
+# process writes its samples there and a scrape of any worker aggregates them.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "mstock_http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route"]
+)
+REQUESTS = Counter(
+    "mstock_http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"]
+)
+MATCH_DURATION = Histogram(
+    "mstock_match_duration_seconds", "Time to match one order against the book",
+    buckets=(.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05)
+)
+FILLS_PER_ORDER = Histogram(
+    "mstock_fills_per_order", "Fills produced by matching one order",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250)
+)
+POOL_CHECKED_OUT = Gauge(
+    "mstock_db_pool_checked_out", "Connections checked out of the pool",
+    ["pool"], multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "mstock_db_pool_overflow", "Connections open beyond pool_size",
+    ["pool"], multiprocess_mode="livesum"
+)
+POOL_WAIT = Histogram(
+    "mstock_db_pool_wait_seconds", "Time spent waiting for a pooled connection",
+    ["pool"], buckets=(.0001, .0005, .001, .005, .01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+RATE_LIMITED = Counter(
+    "mstock_rate_limited_total", "Requests rejected by the per-key rate limits",
+    ["endpoint_class"]
+)
+SHED = Counter(
+    "mstock_shed_total", "Requests shed by admission control",
+    ["reason"]
+)
+REPLICA_LAG = Gauge(
+    "mstock_db_replica_lag_seconds", "Replay lag of the read replica",
+    multiprocess_mode="max"
+)
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout wait time and usage.
+
+    The pool has no event for the start of a checkout, so the wait is timed
+    around _do_get, which blocks while all connections are taken.
+    """
+
+    label = "primary"
+    # Smoothed recent wait, for admission control in this process.
+    recent_wait = 0.0
+    recent_wait_at = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.recent_wait += 0.2 * (waited - self.recent_wait)
+            self.recent_wait_at = time.monotonic()
+            POOL_WAIT.labels(self.label).observe(waited)
+            POOL_OVERFLOW.labels(self.label).set(max(self.overflow(), 0))
+
+
+def watch_pool(engine: AsyncEngine):
+    pool = engine.sync_engine.pool
+    checked_out = POOL_CHECKED_OUT.labels(pool.label)
+    event.listen(pool, "checkout", lambda dbapi_connection, connection_record, connection_proxy: checked_out.inc())
+    event.listen(pool, "checkin", lambda dbapi_connection, connection_record: checked_out.dec())
+
+
+class BookCollector:
+    # Read at scrape time from this process's books, which are complete L2
+    # mirrors in the HTTP workers even when another process matches.
+
+    def collect(self):
+        levels = GaugeMetricFamily("mstock_book_levels", "Resting price levels", labels=["ticker", "side"])
+        quantity = GaugeMetricFamily("mstock_book_quantity", "Resting quantity", labels=["ticker", "side"])
+        for ticker, book in list(books.items()):
+            for direction in (Direction.BUY, Direction.SELL):
+                depth = book.depth(direction)
+                levels.add_metric([ticker, direction.value], len(depth))
+                quantity.add_metric([ticker, direction.value], sum(qty for _, qty in depth))
+        yield levels
+        yield quantity
+
+
+def _registry():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    registry.register(BookCollector())
+    return registry
+
+
+registry = _registry()
+
+
+def render() -> bytes:
+    return generate_latest(registry)
+
+
+def process_exited(pid: int):
+    # Drops the live gauges of a process that is gone; its counters and
+    # histograms keep counting towards the totals.
+    if MULTIPROC_DIR:
+        mark_process_dead(pid)
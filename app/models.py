@@ -1,10 +1,10 @@
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy import Column, String, Integer, Enum as SqlEnum, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID as PGUUID
+from sqlalchemy import Column, String, Integer, BigInteger, Enum as SqlEnum, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PGUUID
 from sqlalchemy.orm import relationship
 
-from app.database import Base, engine
+from app.database import Base
 from app.schemas import UserRole, Direction, OrderStatus
 
 
@@ -37,6 +37,35 @@ class Order(Base):
     filled = Column(Integer, default=0)
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),
+        # Resting orders only; terminal rows are most of the table and are never scanned by side and price.
+        Index(
+            "ix_orders_active_book", "ticker", "direction", "price", "created_at",
+            postgresql_where=text("status IN ('NEW', 'PARTIALLY_EXECUTED')")
+        ),
+    )
+
+
+class OrderArchive(Base):
+    # Terminal orders moved out of `orders`, one partition per month of created_at.
+    __tablename__ = "orders_archive"
+    id = Column(PGUUID(as_uuid=True), primary_key=True)
+    user_id = Column(PGUUID(as_uuid=True))
+    direction = Column(SqlEnum(Direction))
+    ticker = Column(String(10))
+    qty = Column(Integer)
+    price = Column(Integer)
+    status = Column(SqlEnum(OrderStatus))
+    order_type = Column(String(10))
+    created_at = Column(DateTime, primary_key=True)
+    filled = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_orders_archive_user_id_created_at", "user_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
 
 class Balance(Base):
     __tablename__ = "balances"
@@ -54,3 +83,70 @@ class Transaction(Base):
     price = Column(Integer)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_transactions_ticker_timestamp_desc", "ticker", timestamp.desc(), id.desc()),)
+
+
+class UserFill(Base):
+    # Each fill once per side, for the user's own history. No foreign keys:
+    # the orders may have been archived and the history outlives them.
+    __tablename__ = "fills"
+    id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid4)
+    user_id = Column(PGUUID(as_uuid=True), nullable=False)
+    order_id = Column(PGUUID(as_uuid=True), nullable=False)
+    counter_order_id = Column(PGUUID(as_uuid=True), nullable=False)
+    ticker = Column(String(10), nullable=False)
+    side = Column(SqlEnum(Direction), nullable=False)
+    qty = Column(Integer, nullable=False)
+    price = Column(Integer, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    # The inserting transaction's id, which incremental syncs page on.
+    xid = Column(BigInteger, nullable=False, server_default=text("CAST(CAST(pg_current_xact_id() AS text) AS bigint)"))
+
+    __table_args__ = (Index("ix_fills_user_id_xid", "user_id", "xid", "id"),)
+
+
+class Candle(Base):
+    __tablename__ = "candles"
+    ticker = Column(String(10), primary_key=True)
+    interval = Column(String(3), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    open = Column(Integer, nullable=False)
+    high = Column(Integer, nullable=False)
+    low = Column(Integer, nullable=False)
+    close = Column(Integer, nullable=False)
+    volume = Column(BigInteger, nullable=False)
+
+
+class OrderEvent(Base):
+    __tablename__ = "order_events"
+    seq = Column(BigInteger, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    kind = Column(String(10), nullable=False)
+    order_id = Column(PGUUID(as_uuid=True), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_order_events_ticker_seq", "ticker", "seq"),)
+
+
+class BookSnapshot(Base):
+    __tablename__ = "book_snapshots"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    seq = Column(BigInteger, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_book_snapshots_ticker_seq", "ticker", "seq"),)
+
+
+class QueuedOrder(Base):
+    # Orders not matched yet. Every new order is queued; a row is deleted by
+    # whoever claims the order: the transaction that settles it, or a cancel.
+    __tablename__ = "order_queue"
+    seq = Column(BigInteger, primary_key=True, autoincrement=True)
+    order_id = Column(PGUUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, unique=True)
+    ticker = Column(String(10), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_order_queue_ticker_seq", "ticker", "seq"),)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Set
+from uuid import UUID
+
+import asyncpg
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, DATABASE_DSN
+from app.dependencies import match_orders
+from app.feed import feed
+from app.models import Order, QueuedOrder
+from app.schemas import ACTIVE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+QUEUE_CHANNEL = "order_queued"
+OUTCOME_CHANNEL = "order_outcome"
+ORDER_QUEUE_BATCH = int(os.getenv("ORDER_QUEUE_BATCH", 100))
+# Notifications sent while a consumer was not listening are lost, so the
+# queue is also swept for tickers with waiting orders at this interval.
+ORDER_QUEUE_SWEEP_INTERVAL = float(os.getenv("ORDER_QUEUE_SWEEP_INTERVAL", 5))
+RETRY_INTERVAL = 1
+
+NOTIFY_OUTCOMES = text(
+    "SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"
+)
+
+
+async def enqueue(db: AsyncSession, orders: List[Order], notify: bool = True):
+    # In the caller's transaction: the orders are durable once it commits,
+    # and the NOTIFY is only delivered then. Every new order is queued; a
+    # synchronous submit claims it back, so one that fails is matched later.
+    await db.flush()
+    db.add_all([QueuedOrder(order_id=order.id, ticker=order.ticker) for order in orders])
+    if notify:
+        await notify_queued(db, {order.ticker for order in orders})
+
+
+async def notify_queued(db: AsyncSession, tickers: Iterable[str]):
+    for ticker in tickers:
+        await db.execute(select(func.pg_notify(QUEUE_CHANNEL, ticker)))
+
+
+async def claim(db: AsyncSession, order_ids: Iterable[UUID]) -> Set[UUID]:
+    # Only the claimant matches an order, so a synchronous submit and the
+    # consumer never match the same one twice. Cancelling claims it too.
+    result = await db.execute(
+        delete(QueuedOrder).where(QueuedOrder.order_id.in_(list(order_ids))).returning(QueuedOrder.order_id)
+    )
+    return set(result.scalars())
+
+
+def _outcome(order: Order) -> str:
+    return json.dumps({
+        "type": "order",
+        "order_id": str(order.id),
+        "user_id": str(order.user_id),
+        "ticker": order.ticker,
+        "status": order.status.value,
+        "filled": order.filled,
+    })
+
+
+class OrderQueueConsumer:
+    """Matches queued orders, one consumer task per ticker.
+
+    A consumer runs under the matcher's ticker lock, so queued orders are
+    matched in the same serial order as synchronous submits and cancels.
+    """
+
+    def __init__(self, locks: Dict[str, asyncio.Lock], owns: Callable[[str], bool]):
+        self.locks = locks
+        self.owns = owns
+        self._wakeups: Dict[str, asyncio.Event] = defaultdict(asyncio.Event)
+        self._consumers: Dict[str, asyncio.Task] = {}
+        self._listener = None
+
+    def start(self):
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        for task in [self._listener, *self._consumers.values()]:
+            if task is not None:
+                task.cancel()
+
+    def wake(self, ticker: str):
+        if not self.owns(ticker):
+            return
+        self._wakeups[ticker].set()
+        if ticker not in self._consumers:
+            self._consumers[ticker] = asyncio.create_task(self._consume(ticker))
+
+    async def sweep(self):
+        async with AsyncSessionLocal() as db:
+            tickers = (await db.execute(select(QueuedOrder.ticker).distinct())).scalars().all()
+        for ticker in tickers:
+            self.wake(ticker)
+
+    async def _listen(self):
+        while True:
+            try:
+                connection = await asyncpg.connect(DATABASE_DSN)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning(f"Order queue listener cannot connect: {exc}")
+                await asyncio.sleep(RETRY_INTERVAL)
+                continue
+
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            try:
+                await connection.add_listener(QUEUE_CHANNEL, lambda conn, pid, channel, ticker: self.wake(ticker))
+                while not closed.is_set():
+                    try:
+                        await self.sweep()
+                    except SQLAlchemyError as exc:
+                        logger.error(f"Order queue sweep failed: {exc}")
+                    try:
+                        await asyncio.wait_for(closed.wait(), ORDER_QUEUE_SWEEP_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                logger.warning("Order queue listener disconnected")
+            finally:
+                await connection.close()
+
+    async def _consume(self, ticker: str):
+        wakeup = self._wakeups[ticker]
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            try:
+                while await self._drain(ticker):
+                    pass
+            except (SQLAlchemyError, HTTPException) as exc:
+                logger.error(f"Matching queued {ticker} orders failed: {exc}")
+                await asyncio.sleep(RETRY_INTERVAL)
+                wakeup.set()
+
+    async def _drain(self, ticker: str) -> int:
+        async with self.locks[ticker], AsyncSessionLocal() as db:
+            # Orders locked by a concurrent cancel are skipped and picked up by a later pass.
+            rows = (await db.execute(
+                select(QueuedOrder.seq, Order)
+                .join(Order, Order.id == QueuedOrder.order_id)
+                .filter(QueuedOrder.ticker == ticker)
+                .order_by(QueuedOrder.seq)
+                .limit(ORDER_QUEUE_BATCH)
+                .with_for_update(of=[QueuedOrder, Order], skip_locked=True)
+            )).all()
+            if not rows:
+                return 0
+
+            await db.execute(delete(QueuedOrder).where(QueuedOrder.seq.in_([seq for seq, _ in rows])))
+            # Cancelled while queued: dequeue without matching.
+            orders = [order for _, order in rows if order.status in ACTIVE_STATUSES]
+            if orders:
+                await match_orders(db, orders)
+            else:
+                await db.commit()
+
+            if orders:
+                await db.execute(NOTIFY_OUTCOMES, {
+                    "channel": OUTCOME_CHANNEL, "payloads": [_outcome(order) for order in orders]
+                })
+                await db.commit()
+        return len(rows)
+
+
+def _on_outcome(connection, pid, channel, payload):
+    message = json.loads(payload)
+    feed.notify_user(message.pop("user_id"), message)
+
+
+async def listen_for_outcomes(retry_interval: float = 5):
+    # Forwards the outcomes of queued orders to this worker's WebSocket clients.
+    while True:
+        try:
+            connection = await asyncpg.connect(DATABASE_DSN)
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.warning(f"Order outcome listener cannot connect: {exc}")
+            await asyncio.sleep(retry_interval)
+            continue
+
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _: closed.set())
+        try:
+            await connection.add_listener(OUTCOME_CHANNEL, _on_outcome)
+            await closed.wait()
+            logger.warning("Order outcome listener disconnected")
+        finally:
+            await connection.close()
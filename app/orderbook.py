@@ -0,0 +1,204 @@
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from app.schemas import Direction
+
+
+@dataclass(slots=True)
+class RestingOrder:
+    id: UUID
+    user_id: UUID
+    direction: Direction
+    price: int
+    qty: int
+    remaining: int
+
+
+class Fill(NamedTuple):
+    maker_id: UUID
+    maker_user_id: UUID
+    qty: int
+    price: int
+    maker_filled: int
+    maker_remaining: int
+
+
+class PriceLevel:
+    __slots__ = ("price", "qty", "orders")
+
+    def __init__(self, price: int):
+        self.price = price
+        self.qty = 0
+        self.orders = deque()
+
+
+def opposite(direction: Direction) -> Direction:
+    return Direction.SELL if direction == Direction.BUY else Direction.BUY
+
+
+def _key(direction: Direction, price: int) -> int:
+    # Both sides are kept in ascending key order with the best level last,
+    # so consuming the top of the book is a pop() from the end of the list.
+    return price if direction == Direction.BUY else -price
+
+
+class OrderBook:
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self._keys: Dict[Direction, List[int]] = {Direction.BUY: [], Direction.SELL: []}
+        self._levels: Dict[Direction, Dict[int, PriceLevel]] = {Direction.BUY: {}, Direction.SELL: {}}
+        self._orders: Dict[UUID, RestingOrder] = {}
+        self._touched: Dict[Tuple[Direction, int], None] = {}
+        # Journal position reflected by this book, and by its latest stored snapshot.
+        self.seq = 0
+        self.snapshot_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: UUID) -> bool:
+        return order_id in self._orders
+
+    def remaining(self, order_id: UUID) -> int:
+        resting = self._orders.get(order_id)
+        return resting.remaining if resting else 0
+
+    def add(self, order_id: UUID, user_id: UUID, direction: Direction, price: int, qty: int,
+            filled: int = 0) -> RestingOrder:
+        key = _key(direction, price)
+        levels = self._levels[direction]
+        level = levels.get(key)
+        if level is None:
+            level = levels[key] = PriceLevel(price)
+            keys = self._keys[direction]
+            keys.insert(bisect_left(keys, key), key)
+
+        resting = RestingOrder(order_id, user_id, direction, price, qty, qty - filled)
+        level.orders.append(resting)
+        level.qty += resting.remaining
+        self._touched[(direction, key)] = None
+        self._orders[order_id] = resting
+        return resting
+
+    def reduce(self, order_id: UUID, qty: int) -> Optional[RestingOrder]:
+        resting = self._orders.get(order_id)
+        if resting is None:
+            return None
+
+        key = _key(resting.direction, resting.price)
+        level = self._levels[resting.direction][key]
+        qty = min(qty, resting.remaining)
+        resting.remaining -= qty
+        level.qty -= qty
+        self._touched[(resting.direction, key)] = None
+        # An emptied entry stays in the level queue and is skipped by match()
+        # once it reaches the front; only an emptied level is unlinked eagerly.
+        if resting.remaining == 0:
+            del self._orders[order_id]
+        if level.qty == 0:
+            self._remove_level(resting.direction, key)
+        return resting
+
+    def cancel(self, order_id: UUID) -> Optional[RestingOrder]:
+        resting = self._orders.get(order_id)
+        if resting is None:
+            return None
+        return self.reduce(order_id, resting.remaining)
+
+    def match(self, direction: Direction, qty: int, price: Optional[int] = None) -> Tuple[List[Fill], int]:
+        side = opposite(direction)
+        keys = self._keys[side]
+        levels = self._levels[side]
+        fills = []
+
+        while qty > 0 and keys:
+            level = levels[keys[-1]]
+            if price is not None and (level.price > price if direction == Direction.BUY else level.price < price):
+                break
+
+            self._touched[(side, keys[-1])] = None
+            queue = level.orders
+            while qty > 0 and queue:
+                maker = queue[0]
+                if maker.remaining == 0:
+                    queue.popleft()
+                    continue
+
+                traded = min(qty, maker.remaining)
+                maker.remaining -= traded
+                level.qty -= traded
+                qty -= traded
+                fills.append(Fill(
+                    maker.id, maker.user_id, traded, level.price, maker.qty - maker.remaining, maker.remaining
+                ))
+
+                if maker.remaining == 0:
+                    queue.popleft()
+                    del self._orders[maker.id]
+
+            if level.qty == 0:
+                keys.pop()
+                del levels[_key(side, level.price)]
+
+        return fills, qty
+
+    def set_level(self, direction: Direction, price: int, qty: int):
+        # Used by L2 mirrors of books owned by another process: levels carry
+        # only the aggregate quantity, no resting orders.
+        key = _key(direction, price)
+        level = self._levels[direction].get(key)
+        if qty == 0:
+            if level is not None:
+                self._remove_level(direction, key)
+            return
+
+        if level is None:
+            level = self._levels[direction][key] = PriceLevel(price)
+            keys = self._keys[direction]
+            keys.insert(bisect_left(keys, key), key)
+        level.qty = qty
+
+    def resting(self) -> Iterator[RestingOrder]:
+        # Resting orders in priority order, best level first on each side.
+        for direction in (Direction.BUY, Direction.SELL):
+            levels = self._levels[direction]
+            for key in reversed(self._keys[direction]):
+                for resting in levels[key].orders:
+                    if resting.remaining:
+                        yield resting
+
+    def depth(self, direction: Direction, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        keys = self._keys[direction]
+        if limit is not None:
+            if limit <= 0:
+                return []
+            keys = keys[-limit:]
+        levels = self._levels[direction]
+        return [(levels[key].price, levels[key].qty) for key in reversed(keys)]
+
+    def drain_changes(self) -> List[Tuple[Direction, int, int]]:
+        # Levels touched since the previous call, with their current quantity (0 once removed).
+        changes = []
+        for direction, key in self._touched:
+            level = self._levels[direction].get(key)
+            changes.append((direction, abs(key), level.qty if level else 0))
+        self._touched.clear()
+        return changes
+
+    def _remove_level(self, direction: Direction, key: int):
+        keys = self._keys[direction]
+        del keys[bisect_left(keys, key)]
+        del self._levels[direction][key]
+
+
+books: Dict[str, OrderBook] = {}
+
+
+def get_book(ticker: str) -> OrderBook:
+    book = books.get(ticker)
+    if book is None:
+        book = books[ticker] = OrderBook(ticker)
+    return book
@@ -0,0 +1,38 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp: datetime, row_id: UUID) -> str:
+    return urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, UUID]]:
+    if cursor is None:
+        return None
+    try:
+        timestamp, row_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_seq_cursor(seq: int, row_id: UUID) -> str:
+    return urlsafe_b64encode(f"{seq}|{row_id}".encode()).decode()
+
+
+def decode_seq_cursor(cursor: Optional[str]) -> Optional[Tuple[int, UUID]]:
+    if cursor is None:
+        return None
+    try:
+        seq, row_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return int(seq), UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from app.database import engine
+from app.matcher import matcher
+from app.metrics import RATE_LIMITED, SHED
+
+logger = logging.getLogger(__name__)
+
+TRADING = "trading"
+MARKET_DATA = "market_data"
+ADMIN = "admin"
+
+
+def _limit(name: str, rate: float, burst: float) -> Tuple[float, float]:
+    return (
+        float(os.getenv(f"RATE_LIMIT_{name}_RATE", rate)),
+        float(os.getenv(f"RATE_LIMIT_{name}_BURST", burst)),
+    )
+
+
+# (tokens per second, bucket size) per user behind an api_key, or per client
+# address for anonymous requests. A rate of 0 disables the limit.
+LIMITS = {
+    TRADING: _limit("TRADING", 20, 40),
+    MARKET_DATA: _limit("MARKET_DATA", 50, 100),
+    ADMIN: _limit("ADMIN", 20, 40),
+}
+
+# Buckets live in SQLite on tmpfs so every worker on the host draws from the same ones.
+RATE_LIMIT_DB = os.getenv(
+    "RATE_LIMIT_DB",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "mstock-ratelimit.sqlite")
+)
+BUCKET_TTL = 3600
+PRUNE_EVERY = 10000
+# While the store is failing, its warning is logged at most this often.
+STORE_WARNING_INTERVAL = 60
+
+# Trading and admin requests are shed with 503 while this process's pool
+# checkouts wait longer than this on average, or while this many matcher
+# requests are queued.
+ADMISSION_MAX_POOL_WAIT = float(os.getenv("ADMISSION_MAX_POOL_WAIT", 0.5))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 500))
+# A wait measured longer ago than this no longer describes the pool.
+POOL_WAIT_STALE_AFTER = 5
+
+# Refill, then take a token if a whole one is available, in one statement.
+# The SET expressions all see the row as it was before the update.
+TAKE = """
+    INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+    ON CONFLICT (key) DO UPDATE SET
+        allowed = min(:burst, tokens + (:now - updated) * :rate) >= 1,
+        tokens = min(:burst, tokens + (:now - updated) * :rate)
+            - (min(:burst, tokens + (:now - updated) * :rate) >= 1),
+        updated = :now
+    RETURNING tokens, allowed
+"""
+
+
+class BucketStore:
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.path = path
+        self._conn = None
+        self._executor = None
+        self._pid = None
+        self._takes = 0
+        self._warned_at = None
+        self._failures = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL)"
+            )
+        return self._conn
+
+    def _take(self, key: str, rate: float, burst: float) -> Optional[float]:
+        now = time.time()
+        try:
+            conn = self._connect()
+            tokens, allowed = conn.execute(TAKE, {"key": key, "rate": rate, "burst": burst, "now": now}).fetchone()
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - BUCKET_TTL,))
+        except sqlite3.Error as exc:
+            # A busy or broken store must not take the API down with it.
+            self._failed(exc)
+            return None
+        return None if allowed else (1 - tokens) / rate
+
+    def _failed(self, exc: sqlite3.Error):
+        self._failures += 1
+        now = time.monotonic()
+        if self._warned_at is None or now - self._warned_at >= STORE_WARNING_INTERVAL:
+            logger.warning(f"Rate limit store unavailable, {self._failures} requests not limited: {exc}")
+            self._warned_at = now
+            self._failures = 0
+
+    async def take(self, key: str, rate: float, burst: float) -> Optional[float]:
+        # Returns None if the request may proceed, else seconds until it may.
+        # A busy store waits up to its timeout, so takes run off the event
+        # loop, one at a time on this process's own thread and connection.
+        if self._pid != os.getpid():
+            # Neither the connection nor the thread survives a fork.
+            self._conn = None
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ratelimit")
+            self._pid = os.getpid()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._take, key, rate, burst)
+
+
+buckets = BucketStore()
+
+
+def endpoint_class(path: str) -> Optional[str]:
+    if path.startswith("/api/v1/admin/"):
+        return ADMIN
+    if path.startswith("/api/v1/public/") or path == "/public/register":
+        return MARKET_DATA
+    if path.startswith("/api/v1/"):
+        return TRADING
+    return None
+
+
+async def rate_limit(endpoint: str, identity: str) -> Optional[int]:
+    # Retry-After in whole seconds when over the limit.
+    rate, burst = LIMITS[endpoint]
+    if rate <= 0:
+        return None
+    retry_after = await buckets.take(f"{endpoint}:{identity}", rate, burst)
+    if retry_after is None:
+        return None
+    RATE_LIMITED.labels(endpoint).inc()
+    return max(1, math.ceil(retry_after))
+
+
+def shed_reason() -> Optional[str]:
+    pool = engine.sync_engine.pool
+    if time.monotonic() - pool.recent_wait_at < POOL_WAIT_STALE_AFTER and pool.recent_wait > ADMISSION_MAX_POOL_WAIT:
+        reason = "pool_wait"
+    elif matcher.queue_depth() > ADMISSION_MAX_QUEUE:
+        reason = "matcher_queue"
+    else:
+        return None
+    SHED.labels(reason).inc()
+    return reason
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, ReadSessionLocal, read_engine, DB_REPLICA_HOST
+from app.metrics import REPLICA_LAG
+
+logger = logging.getLogger(__name__)
+
+# Reads fall back to the primary while the replica is further behind than
+# this, so market data is never staler than REPLICA_MAX_LAG plus one interval.
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_INTERVAL = float(os.getenv("REPLICA_LAG_INTERVAL", 1))
+
+# An idle primary sends no WAL, so the replay timestamp ages without the
+# replica falling behind: the lag is only counted while WAL is still unreplayed.
+# A replica whose WAL receiver is not streaming has replayed everything it
+# received and still serves stale data, so it has no lag (NULL). Without
+# pg_read_all_stats the receiver's status is hidden and only its pid shows.
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# None until measured, and after a failed measurement.
+replica_lag: Optional[float] = 0.0 if not DB_REPLICA_HOST else None
+
+
+def read_session() -> AsyncSession:
+    if replica_lag is not None and replica_lag <= REPLICA_MAX_LAG:
+        return ReadSessionLocal()
+    return AsyncSessionLocal()
+
+
+async def monitor_replica_lag():
+    global replica_lag
+    if not DB_REPLICA_HOST:
+        return
+    while True:
+        try:
+            async with read_engine.connect() as conn:
+                lag = (await conn.execute(LAG_QUERY)).scalar_one()
+            if lag is None:
+                if replica_lag is not None:
+                    logger.error("Replica is not streaming WAL from the primary, reading from the primary")
+                replica_lag = None
+            else:
+                replica_lag = float(lag)
+                REPLICA_LAG.set(replica_lag)
+        except (SQLAlchemyError, OSError) as exc:
+            if replica_lag is not None:
+                logger.error(f"Replica lag check failed, reading from the primary: {exc}")
+            replica_lag = None
+        await asyncio.sleep(REPLICA_LAG_INTERVAL)
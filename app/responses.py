@@ -0,0 +1,46 @@
+import orjson
+from starlette.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded by orjson.
+
+    Hot read endpoints return it with plain dicts built straight from rows or
+    the in-memory book, skipping per-row pydantic models and response_model
+    validation. Their response_model is kept for the OpenAPI schema, and
+    scripts/check_response_schemas.py checks the two stay in agreement.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def transaction_rows(rows) -> list:
+    return [
+        {"ticker": row.ticker, "amount": row.amount, "price": row.price, "timestamp": row.timestamp}
+        for row in rows
+    ]
+
+
+def order_rows(rows) -> list:
+    # The LimitOrderBody / MarketOrderBody union: market orders carry no price.
+    return [
+        {"direction": row.direction, "ticker": row.ticker, "qty": row.qty, "price": row.price}
+        if row.price is not None else
+        {"direction": row.direction, "ticker": row.ticker, "qty": row.qty}
+        for row in rows
+    ]
+
+
+def fill_rows(rows) -> list:
+    return [
+        {
+            "order_id": row.order_id, "counter_order_id": row.counter_order_id, "ticker": row.ticker,
+            "side": row.side, "qty": row.qty, "price": row.price, "timestamp": row.timestamp,
+        }
+        for row in rows
+    ]
+
+
+def level_rows(levels) -> list:
+    return [{"price": price, "qty": qty} for price, qty in levels]
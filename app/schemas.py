@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Annotated
+from typing import List, Annotated, Literal, Optional, Union
 from enum import Enum
 
 from pydantic import BaseModel, UUID4, conint, Field, StringConstraints, ConfigDict, field_validator
@@ -22,6 +22,16 @@ class OrderStatus(Enum):
     CANCELLED = "CANCELLED"
 
 
+ACTIVE_STATUSES = (OrderStatus.NEW, OrderStatus.PARTIALLY_EXECUTED)
+
+
+class CandleInterval(Enum):
+    MINUTE = "1m"
+    FIVE_MINUTES = "5m"
+    HOUR = "1h"
+    DAY = "1d"
+
+
 class NewUser(BaseModel):
     name: str = Field(..., min_length=3)
 
@@ -78,6 +88,36 @@ class TransactionSchema(BaseModel):
         protected_namespaces=())
 
 
+class CandleSchema(BaseModel):
+    timestamp: datetime
+    open: int
+    high: int
+    low: int
+    close: int
+    volume: int
+
+
+class TickerSchema(BaseModel):
+    ticker: str
+    best_bid: Optional[int]
+    best_ask: Optional[int]
+    spread: Optional[int]
+    last_price: Optional[int]
+    volume_24h: int
+    change_24h: Optional[int]
+    change_24h_percent: Optional[float]
+
+
+class FillSchema(BaseModel):
+    order_id: UUID4
+    counter_order_id: UUID4
+    ticker: str
+    side: Direction
+    qty: int
+    price: int
+    timestamp: datetime
+
+
 class LimitOrderBody(BaseModel):
     direction: Direction
     ticker: str
@@ -91,12 +131,64 @@ class MarketOrderBody(BaseModel):
     qty: conint(ge=1)
 
 
+class OrderState(BaseModel):
+    # An order with its progress, how the outcome of a queued order is read.
+    # Market orders carry no price.
+    id: UUID4
+    status: OrderStatus
+    filled: int
+    direction: Direction
+    ticker: str
+    qty: int
+    price: Optional[int] = None
+
+
 class CreateOrderResponse(BaseModel):
     success: bool = Field(default=True)
     order_id: UUID4
 
 
+MAX_BATCH_ORDERS = 100
+
+OrderBatch = Annotated[
+    List[Union[LimitOrderBody, MarketOrderBody]],
+    Field(min_length=1, max_length=MAX_BATCH_ORDERS)
+]
+
+
+class BatchOrderResult(BaseModel):
+    order_id: UUID4
+    status: OrderStatus
+    filled: int
+
+
+class CancelOrderResult(BaseModel):
+    order_id: UUID4
+    success: bool
+    # Why an order was not cancelled.
+    detail: Optional[str] = None
+
+
 class BalanceOperation(BaseModel):
     user_id: UUID4
     ticker: str
     amount: conint(gt=0)
+
+
+class BulkBalanceOperation(BalanceOperation):
+    op: Literal["deposit", "withdraw"]
+
+
+class BulkRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class BulkBalanceResult(BaseModel):
+    applied: int
+    errors: List[BulkRowError]
+
+
+class BulkUsersResult(BaseModel):
+    users: List[UserResponse]
+    errors: List[BulkRowError]
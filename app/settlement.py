@@ -0,0 +1,85 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from app.events import ACCEPT, CANCEL, FILL, REST
+from app.orderbook import Fill, OrderBook, opposite
+from app.schemas import Direction, OrderStatus
+
+SETTLEMENT_CURRENCY = 'RUB'
+
+
+class Settlement:
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.balances: Dict[Tuple[UUID, str], int] = defaultdict(int)
+        self.orders: Dict[UUID, Tuple[int, OrderStatus]] = {}
+        self.fills: List[Fill] = []
+        # (user_id, order_id, counter_order_id, side, qty, price), both sides of every fill.
+        self.user_fills: List[Tuple[UUID, UUID, UUID, Direction, int, int]] = []
+        self.events: List[dict] = []
+
+    def record(self, kind: str, order_id: UUID, **payload):
+        self.events.append({"ticker": self.ticker, "kind": kind, "order_id": order_id, "payload": payload})
+
+    def add(self, taker_id: UUID, taker_user_id: UUID, direction: Direction, fill: Fill):
+        if direction == Direction.BUY:
+            buyer_id, seller_id = taker_user_id, fill.maker_user_id
+        else:
+            buyer_id, seller_id = fill.maker_user_id, taker_user_id
+
+        total_amount = fill.qty * fill.price
+        self.balances[(buyer_id, self.ticker)] += fill.qty
+        self.balances[(buyer_id, SETTLEMENT_CURRENCY)] -= total_amount
+        self.balances[(seller_id, self.ticker)] -= fill.qty
+        self.balances[(seller_id, SETTLEMENT_CURRENCY)] += total_amount
+
+        self.orders[fill.maker_id] = (
+            fill.maker_filled,
+            OrderStatus.EXECUTED if fill.maker_remaining == 0 else OrderStatus.PARTIALLY_EXECUTED
+        )
+        self.fills.append(fill)
+        self.user_fills.append((taker_user_id, taker_id, fill.maker_id, direction, fill.qty, fill.price))
+        self.user_fills.append((fill.maker_user_id, fill.maker_id, taker_id, opposite(direction), fill.qty, fill.price))
+        self.record(
+            FILL, taker_id,
+            maker_id=str(fill.maker_id), buyer_id=str(buyer_id), seller_id=str(seller_id),
+            qty=fill.qty, price=fill.price
+        )
+
+
+def match_order(book: OrderBook, order, settlement: Settlement):
+    # Matches one incoming order against the book and records the outcome in
+    # the settlement. Takes an Order row or anything with the same attributes;
+    # nothing here touches the database.
+    settlement.record(
+        ACCEPT, order.id,
+        user_id=str(order.user_id), direction=order.direction.value, order_type=order.order_type,
+        price=order.price, qty=order.qty
+    )
+
+    fills, remaining_qty = book.match(
+        order.direction,
+        order.qty - order.filled,
+        order.price if order.order_type == 'limit' else None
+    )
+
+    for fill in fills:
+        settlement.add(order.id, order.user_id, order.direction, fill)
+
+    if fills:
+        order.filled += sum(fill.qty for fill in fills)
+        order.status = OrderStatus.EXECUTED if order.filled >= order.qty else OrderStatus.PARTIALLY_EXECUTED
+
+    if remaining_qty > 0:
+        if order.order_type == 'limit':
+            book.add(order.id, order.user_id, order.direction, order.price, order.qty, order.filled)
+            settlement.record(
+                REST, order.id,
+                user_id=str(order.user_id), direction=order.direction.value, price=order.price,
+                qty=order.qty, remaining=remaining_qty
+            )
+        else:
+            # Market orders never rest: whatever the book could not fill is dropped.
+            order.status = OrderStatus.CANCELLED
+            settlement.record(CANCEL, order.id, remaining=remaining_qty)
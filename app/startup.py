@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from uuid import uuid4
+
+import asyncpg
+from alembic.script import ScriptDirectory
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import DATABASE_DSN, DB_REPLICA_HOST, engine, read_engine
+from app.models import Balance, Instrument, Order, OrderArchive, Transaction, User
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+# Opens pool_size connections per pool at startup and prepares the hot
+# statements on each, so the first requests do not pay for either.
+POOL_WARMUP = os.getenv("POOL_WARMUP", "1") == "1"
+DB_WAIT_TIMEOUT = float(os.getenv("DB_WAIT_TIMEOUT", 60))
+REPLICA_WARMUP_TIMEOUT = float(os.getenv("REPLICA_WARMUP_TIMEOUT", 5))
+
+
+def hot_statements():
+    # Compiled to the same SQL as the endpoints' queries, which is what the
+    # asyncpg dialect caches prepared statements by.
+    order_id, user_id = uuid4(), uuid4()
+    return [
+        select(User.id, User.name, User.role).filter(User.api_key == ""),
+        select(Balance).filter(Balance.user_id == user_id),
+        select(Order).filter(Order.id == order_id, Order.user_id == user_id),
+        select(OrderArchive).filter(OrderArchive.id == order_id, OrderArchive.user_id == user_id),
+    ]
+
+
+def hot_read_statements():
+    return [
+        select(Instrument),
+        select(Transaction.ticker, Transaction.amount, Transaction.price, Transaction.timestamp, Transaction.id)
+        .filter(Transaction.ticker == "")
+        .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+        .limit(1),
+    ]
+
+
+async def check_schema():
+    # One query instead of create_all: the schema is owned by the migrations.
+    expected = ScriptDirectory(MIGRATIONS_DIR).get_current_head()
+    try:
+        async with engine.connect() as conn:
+            current = (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar_one_or_none()
+    except SQLAlchemyError:
+        current = None
+    if current != expected:
+        raise RuntimeError(f"Database schema is at {current}, expected {expected}: run `alembic upgrade head`")
+
+
+async def warm_pool(pool_engine: AsyncEngine, statements):
+    async def warm_connection():
+        async with pool_engine.connect() as conn:
+            for statement in statements:
+                await conn.execute(statement)
+
+    # All held at once, so each is a different connection.
+    await asyncio.gather(*(warm_connection() for _ in range(pool_engine.sync_engine.pool.size())))
+
+
+async def warm_pools():
+    if not POOL_WARMUP:
+        return
+    started = time.perf_counter()
+    await warm_pool(engine, hot_statements())
+    if DB_REPLICA_HOST:
+        # Best effort: reads fall back to the primary while the replica is
+        # unreachable or still being cloned, so it must not fail startup.
+        try:
+            await asyncio.wait_for(warm_pool(read_engine, hot_read_statements()), REPLICA_WARMUP_TIMEOUT)
+        except (SQLAlchemyError, OSError, asyncio.TimeoutError) as exc:
+            logger.warning(f"Read replica pool not warmed up: {exc}")
+    logger.info(f"Connection pools warmed up in {time.perf_counter() - started:.3f}s")
+
+
+async def wait_for_db(timeout: float = DB_WAIT_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = await asyncpg.connect(DATABASE_DSN, timeout=5)
+            await conn.fetchval("SELECT 1")
+            await conn.close()
+            return True
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as exc:
+            if time.monotonic() > deadline:
+                logger.error(f"Database not ready after {timeout}s: {exc}")
+                return False
+        await asyncio.sleep(0.5)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Wait until the database accepts queries")
+    parser.add_argument("--timeout", type=float, default=DB_WAIT_TIMEOUT)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(wait_for_db(args.timeout)) else 1)
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.candles import bucket_start, naive_utc
+from app.feed import feed
+from app.models import Candle, Instrument
+from app.orderbook import books
+from app.replica import read_session
+from app.schemas import CandleInterval, Direction
+
+logger = logging.getLogger(__name__)
+
+# Trades and book changes update the board as they are published; a full
+# reload picks up listed/delisted instruments and anything a resync skipped.
+TICKERS_RELOAD_INTERVAL = float(os.getenv("TICKERS_RELOAD_INTERVAL", 60))
+WINDOW = timedelta(hours=24)
+
+
+class TickerStats:
+    __slots__ = ("last_price", "hours")
+
+    def __init__(self):
+        self.last_price: Optional[int] = None
+        # Hour bucket -> [open, volume] for the trailing 24h, oldest first.
+        self.hours: Dict[datetime, List[int]] = {}
+
+    def add_trade(self, timestamp: datetime, qty: int, price: int):
+        bucket = bucket_start(timestamp, CandleInterval.HOUR)
+        hour = self.hours.get(bucket)
+        if hour is None:
+            self.hours[bucket] = [price, qty]
+        else:
+            hour[1] += qty
+        self.last_price = price
+
+    def expire(self, now: datetime) -> bool:
+        # The window moves by whole hours, like the 1h candles it is loaded from.
+        start = bucket_start(now - WINDOW, CandleInterval.HOUR)
+        expired = [hour for hour in self.hours if hour <= start]
+        for hour in expired:
+            del self.hours[hour]
+        return bool(expired)
+
+    def merge(self, pushed: Optional["TickerStats"]) -> "TickerStats":
+        # These stats were just reloaded, possibly from a replica that has
+        # not replayed trades this worker was already pushed. Volume in an
+        # hour only grows, so an hour with more pushed volume keeps the
+        # pushed figures, and the last price too if it is the latest hour.
+        if pushed is None or not pushed.hours:
+            return self
+        for bucket, (open_, volume) in pushed.hours.items():
+            loaded = self.hours.get(bucket)
+            if loaded is None or volume > loaded[1]:
+                self.hours[bucket] = [loaded[0] if loaded else open_, volume]
+                if bucket == max(self.hours):
+                    self.last_price = pushed.last_price
+        self.hours = dict(sorted(self.hours.items()))
+        return self
+
+
+class TickerBoard:
+    """Top of book, last price and 24h stats for every instrument.
+
+    A feed listener: it receives the same level and trade updates as the
+    WebSocket subscribers. The encoded response and its ETag are rebuilt
+    only when a new version is requested after a change.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, TickerStats] = {}
+        self.version = 0
+        self._rendered: Optional[Tuple[int, bytes, str]] = None
+        self._reloader = None
+
+    async def start(self):
+        await self.reload()
+        feed.listeners.append(self)
+        self._reloader = asyncio.create_task(self._reload_periodically())
+
+    async def close(self):
+        if self._reloader is not None:
+            self._reloader.cancel()
+        if self in feed.listeners:
+            feed.listeners.remove(self)
+
+    async def reload(self):
+        since = bucket_start(datetime.utcnow() - WINDOW, CandleInterval.HOUR)
+        async with read_session() as db:
+            tickers = (await db.execute(select(Instrument.ticker))).scalars().all()
+            hours = await db.execute(
+                select(Candle.ticker, Candle.bucket, Candle.open, Candle.close, Candle.volume)
+                .filter(Candle.interval == CandleInterval.HOUR.value, Candle.bucket > since)
+                .order_by(Candle.ticker, Candle.bucket)
+            )
+            # Last price of tickers that did not trade in the window.
+            closes = await db.execute(
+                select(Candle.ticker, Candle.close)
+                .distinct(Candle.ticker)
+                .filter(Candle.interval == CandleInterval.DAY.value)
+                .order_by(Candle.ticker, Candle.bucket.desc())
+            )
+
+        stats = {ticker: TickerStats() for ticker in tickers}
+        for ticker, close in closes:
+            if ticker in stats:
+                stats[ticker].last_price = close
+        for ticker, bucket, open_, close, volume in hours:
+            if ticker in stats:
+                stats[ticker].hours[bucket] = [open_, volume]
+                stats[ticker].last_price = close
+        self.stats = {ticker: loaded.merge(self.stats.get(ticker)) for ticker, loaded in stats.items()}
+        self.version += 1
+
+    async def _reload_periodically(self):
+        while True:
+            await asyncio.sleep(TICKERS_RELOAD_INTERVAL)
+            try:
+                await self.reload()
+            except SQLAlchemyError as exc:
+                logger.error(f"Ticker board reload failed: {exc}")
+
+    def push_snapshot(self, ticker: str):
+        self.version += 1
+
+    def push_levels(self, ticker: str, changes: List[Tuple[Direction, int, int]]):
+        self.version += 1
+
+    def push_trades(self, ticker: str, trades: List[dict]):
+        stats = self.stats.get(ticker)
+        if stats is None:
+            # Listed since the last reload.
+            stats = self.stats[ticker] = TickerStats()
+        for trade in trades:
+            stats.add_trade(naive_utc(datetime.fromisoformat(trade["timestamp"])), trade["amount"], trade["price"])
+        self.version += 1
+
+    def _row(self, ticker: str, stats: TickerStats) -> dict:
+        book = books.get(ticker)
+        best_bid = book.depth(Direction.BUY, 1) if book else []
+        best_ask = book.depth(Direction.SELL, 1) if book else []
+        bid = best_bid[0][0] if best_bid else None
+        ask = best_ask[0][0] if best_ask else None
+
+        open_24h = next(iter(stats.hours.values()))[0] if stats.hours else None
+        change = stats.last_price - open_24h if open_24h is not None else None
+        return {
+            "ticker": ticker,
+            "best_bid": bid,
+            "best_ask": ask,
+            "spread": ask - bid if bid is not None and ask is not None else None,
+            "last_price": stats.last_price,
+            "volume_24h": sum(volume for _, volume in stats.hours.values()),
+            "change_24h": change,
+            "change_24h_percent": round(change * 100 / open_24h, 2) if change is not None else None,
+        }
+
+    def render(self) -> Tuple[bytes, str]:
+        now = datetime.utcnow()
+        if any([stats.expire(now) for stats in self.stats.values()]):
+            self.version += 1
+
+        if self._rendered is None or self._rendered[0] != self.version:
+            body = orjson.dumps([self._row(ticker, stats) for ticker, stats in sorted(self.stats.items())])
+            # Derived from the content, so workers holding the same state agree on it.
+            etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+            self._rendered = (self.version, body, etag)
+        return self._rendered[1], self._rendered[2]
+
+
+board = TickerBoard()
@@ -0,0 +1,110 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+SQL_TRACE = os.getenv("SQL_TRACE", "").lower() in ("1", "true", "yes")
+SQL_TRACE_SLOW_MS = float(os.getenv("SQL_TRACE_SLOW_MS", 500))
+# Profiling is requested per call with an X-Profile header carrying this
+# token; it stays disabled while the token is unset.
+PROFILE_TOKEN = os.getenv("SQL_PROFILE_TOKEN")
+PROFILE_INTERVAL = float(os.getenv("SQL_PROFILE_INTERVAL", 0.005))
+PROFILE_TOP = 20
+MAX_LOGGED_STATEMENT = 500
+
+
+class RequestTrace:
+    __slots__ = ("statements", "db_time")
+
+    def __init__(self):
+        self.statements: List[Tuple[str, float]] = []
+        self.db_time = 0.0
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context, not the pooled connection,
+    # so a statement that fails leaves nothing behind for later ones.
+    if current_trace.get() is not None:
+        context.trace_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace.get()
+    started = getattr(context, "trace_started", None)
+    if trace is not None and started is not None:
+        elapsed = time.perf_counter() - started
+        trace.statements.append((statement, elapsed))
+        trace.db_time += elapsed
+
+
+def instrument(engine: AsyncEngine):
+    # The engine events run in the greenlet that carries the request's
+    # context, so statements are attributed to the request that issued them.
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def server_timing(trace: RequestTrace, total: float) -> str:
+    return (
+        f'db;dur={trace.db_time * 1000:.1f};desc="{len(trace.statements)} queries", '
+        f'app;dur={(total - trace.db_time) * 1000:.1f}'
+    )
+
+
+def log_slow(method: str, path: str, trace: RequestTrace, total: float):
+    lines = [
+        f"  {elapsed * 1000:8.1f} ms  {' '.join(statement.split())[:MAX_LOGGED_STATEMENT]}"
+        for statement, elapsed in trace.statements
+    ]
+    logger.warning(
+        "Slow request %s %s: %.1f ms, %d queries, %.1f ms in the database\n%s",
+        method, path, total * 1000, len(trace.statements), trace.db_time * 1000, "\n".join(lines)
+    )
+
+
+class Sampler:
+    """Samples the event loop thread's stack from a helper thread.
+
+    The loop serves other requests concurrently, so the profile covers
+    everything the process did while this request was in flight.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_filename}:{frame.f_code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def report(self) -> str:
+        # Collapsed stacks, the input format of flamegraph tools.
+        return "\n".join(f"{stack} {samples}" for stack, samples in self.stacks.most_common(PROFILE_TOP))
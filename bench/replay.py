@@ -0,0 +1,296 @@
+"""Deterministic matching benchmark and order-flow replay.
+
+Pushes a JSONL order flow through the same matching and settlement code the
+API uses (app.settlement.match_order), without Postgres. One operation per line:
+
+    {"op": "submit", "id": "<uuid>", "user": "<uuid>", "ticker": "MEMCOIN", "direction": "BUY", "qty": 5, "price": 100}
+    {"op": "cancel", "id": "<uuid>"}
+
+A submit without a price is a market order. Generate a synthetic flow, replay
+it, and keep the digest to compare against another engine version:
+
+    python -m bench.replay generate --orders 200000 > flow.jsonl
+    python -m bench.replay run flow.jsonl --store sqlite --expect <digest>
+
+The digest is a sha256 over every fill in execution order, the final state
+of every order and every non-zero balance, so it is equal only if the
+replays produced byte-identical results.
+"""
+import argparse
+import hashlib
+import json
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from app.events import FILL
+from app.orderbook import OrderBook
+from app.schemas import Direction, OrderStatus
+from app.settlement import Settlement, match_order
+
+
+@dataclass(slots=True)
+class ReplayOrder:
+    id: UUID
+    user_id: UUID
+    direction: Direction
+    ticker: str
+    qty: int
+    price: Optional[int]
+    order_type: str
+    filled: int = 0
+    status: OrderStatus = OrderStatus.NEW
+
+
+def fill_rows(settlement: Settlement):
+    for event in settlement.events:
+        if event["kind"] == FILL:
+            payload = event["payload"]
+            yield (
+                settlement.ticker, str(event["order_id"]), payload["maker_id"],
+                payload["buyer_id"], payload["seller_id"], payload["qty"], payload["price"]
+            )
+
+
+def balance_rows(settlement: Settlement):
+    # Sorted like write_settlement, so a store with row locks would take them in the same order.
+    return [
+        (str(user_id), ticker, amount)
+        for (user_id, ticker), amount in sorted(settlement.balances.items(), key=lambda item: (str(item[0][0]), item[0][1]))
+        if amount
+    ]
+
+
+class MemoryStore:
+    def __init__(self):
+        self.fills = []
+        self.orders = {}
+        self.balances = defaultdict(int)
+
+    def settle(self, order: ReplayOrder, settlement: Settlement):
+        self.fills.extend(fill_rows(settlement))
+        for user_id, ticker, amount in balance_rows(settlement):
+            self.balances[(user_id, ticker)] += amount
+        for order_id, (filled, status) in settlement.orders.items():
+            self.orders[str(order_id)] = (filled, status.value)
+        self.orders[str(order.id)] = (order.filled, order.status.value)
+
+    def cancel(self, order_id: UUID):
+        filled, _ = self.orders[str(order_id)]
+        self.orders[str(order_id)] = (filled, OrderStatus.CANCELLED.value)
+
+    def canonical(self):
+        for row in self.fills:
+            yield ("fill",) + row
+        for order_id, state in sorted(self.orders.items()):
+            yield ("order", order_id) + state
+        for key, amount in sorted(self.balances.items()):
+            if amount:
+                yield ("balance",) + key + (amount,)
+
+
+class SQLiteStore:
+    # Persists each settlement in its own transaction, the way the API commits
+    # one settlement per matching run.
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE fills (
+                seq INTEGER PRIMARY KEY, ticker TEXT, taker_id TEXT, maker_id TEXT,
+                buyer_id TEXT, seller_id TEXT, qty INTEGER, price INTEGER
+            );
+            CREATE TABLE orders (id TEXT PRIMARY KEY, filled INTEGER, status TEXT);
+            CREATE TABLE balances (user_id TEXT, ticker TEXT, amount INTEGER, PRIMARY KEY (user_id, ticker));
+        """)
+
+    def settle(self, order: ReplayOrder, settlement: Settlement):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO fills (ticker, taker_id, maker_id, buyer_id, seller_id, qty, price) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", fill_rows(settlement)
+            )
+            self.conn.executemany(
+                "INSERT INTO balances VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, ticker) DO UPDATE SET amount = amount + excluded.amount",
+                balance_rows(settlement)
+            )
+            self.conn.executemany(
+                "UPDATE orders SET filled = ?, status = ? WHERE id = ?",
+                [(filled, status.value, str(order_id)) for order_id, (filled, status) in settlement.orders.items()]
+            )
+            self.conn.execute("INSERT INTO orders VALUES (?, ?, ?)", (str(order.id), order.filled, order.status.value))
+
+    def cancel(self, order_id: UUID):
+        with self.conn:
+            self.conn.execute("UPDATE orders SET status = ? WHERE id = ?", (OrderStatus.CANCELLED.value, str(order_id)))
+
+    def canonical(self):
+        for row in self.conn.execute(
+                "SELECT ticker, taker_id, maker_id, buyer_id, seller_id, qty, price FROM fills ORDER BY seq"):
+            yield ("fill",) + row
+        for row in self.conn.execute("SELECT id, filled, status FROM orders ORDER BY id"):
+            yield ("order",) + row
+        for row in self.conn.execute(
+                "SELECT user_id, ticker, amount FROM balances WHERE amount != 0 ORDER BY user_id, ticker"):
+            yield ("balance",) + row
+
+
+def load(path: str):
+    ops = []
+    with open(path) as flow:
+        for line in flow:
+            if not line.strip():
+                continue
+            op = json.loads(line)
+            if op["op"] == "submit":
+                ops.append(ReplayOrder(
+                    UUID(op["id"]), UUID(op["user"]), Direction(op["direction"]), op["ticker"], op["qty"],
+                    op.get("price"), "limit" if op.get("price") is not None else "market"
+                ))
+            else:
+                ops.append(UUID(op["id"]))
+    return ops
+
+
+def replay(ops, store):
+    books = {}
+    tickers = {}
+    submitted = cancelled = fills = 0
+
+    started = time.perf_counter()
+    for op in ops:
+        if isinstance(op, ReplayOrder):
+            book = books.get(op.ticker)
+            if book is None:
+                book = books[op.ticker] = OrderBook(op.ticker)
+            settlement = Settlement(op.ticker)
+            match_order(book, op, settlement)
+            store.settle(op, settlement)
+            tickers[op.id] = op.ticker
+            submitted += 1
+            fills += len(settlement.fills)
+        else:
+            book = books.get(tickers.get(op))
+            if book is not None and book.cancel(op) is not None:
+                store.cancel(op)
+                cancelled += 1
+    elapsed = time.perf_counter() - started
+
+    for book in books.values():
+        book.drain_changes()
+    return books, elapsed, submitted, cancelled, fills
+
+
+def bytes_per_resting_order(books):
+    # Rebuilds the final books under tracemalloc; replaying under it would
+    # distort the timings above.
+    resting = [(ticker, order) for ticker, book in books.items() for order in book.resting()]
+    if not resting:
+        return None
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rebuilt = {ticker: OrderBook(ticker) for ticker in books}
+    for ticker, order in resting:
+        rebuilt[ticker].add(order.id, order.user_id, order.direction, order.price, order.qty, order.qty - order.remaining)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return round((after - before) / len(resting), 1)
+
+
+def digest(store) -> str:
+    sha = hashlib.sha256()
+    for row in store.canonical():
+        sha.update("\t".join(map(str, row)).encode())
+        sha.update(b"\n")
+    return sha.hexdigest()
+
+
+def run(args):
+    ops = load(args.flow)
+    store = SQLiteStore(args.sqlite) if args.store == "sqlite" else MemoryStore()
+    books, elapsed, submitted, cancelled, fills = replay(ops, store)
+    result = digest(store)
+
+    json.dump({
+        "store": args.store,
+        "orders": submitted,
+        "cancels": cancelled,
+        "fills": fills,
+        "seconds": round(elapsed, 3),
+        "orders_per_second": round(submitted / elapsed, 1) if elapsed else None,
+        "fills_per_second": round(fills / elapsed, 1) if elapsed else None,
+        "resting_orders": sum(len(book) for book in books.values()),
+        "bytes_per_resting_order": bytes_per_resting_order(books),
+        "digest": result,
+    }, sys.stdout, indent=2)
+    print()
+
+    if args.expect and args.expect != result:
+        print(f"digest mismatch: expected {args.expect}, got {result}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+
+    def uuid():
+        return UUID(int=rng.getrandbits(128), version=4)
+
+    users = [str(uuid()) for _ in range(args.users)]
+    tickers = [f"T{i}" for i in range(args.tickers)]
+    resting = []
+
+    for _ in range(args.orders):
+        if resting and rng.random() < args.cancel_ratio:
+            order_id = resting.pop(rng.randrange(len(resting)))
+            print(json.dumps({"op": "cancel", "id": order_id}))
+            continue
+
+        op = {
+            "op": "submit", "id": str(uuid()), "user": rng.choice(users), "ticker": rng.choice(tickers),
+            "direction": rng.choice(("BUY", "SELL")), "qty": rng.randint(1, 20),
+        }
+        if rng.random() >= args.market_ratio:
+            sign = -1 if op["direction"] == "BUY" else 1
+            op["price"] = args.mid + sign * rng.randint(-2, args.spread)
+            resting.append(op["id"])
+        print(json.dumps(op))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser("run", help="replay a flow and report throughput and the digest")
+    replay_parser.add_argument("flow")
+    replay_parser.add_argument("--store", choices=("memory", "sqlite"), default="memory")
+    replay_parser.add_argument("--sqlite", default=":memory:", help="database file for --store sqlite")
+    replay_parser.add_argument("--expect", help="fail unless the replay produces this digest")
+    replay_parser.set_defaults(handler=run)
+
+    generate_parser = commands.add_parser("generate", help="write a synthetic flow to stdout")
+    generate_parser.add_argument("--orders", type=int, default=100000)
+    generate_parser.add_argument("--users", type=int, default=100)
+    generate_parser.add_argument("--tickers", type=int, default=4)
+    generate_parser.add_argument("--mid", type=int, default=1000)
+    generate_parser.add_argument("--spread", type=int, default=50)
+    generate_parser.add_argument("--market-ratio", type=float, default=0.1)
+    generate_parser.add_argument("--cancel-ratio", type=float, default=0.2)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.set_defaults(handler=generate)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # Without matcher processes every worker matches against a private book.
+    if server.cfg.workers > 1 and not int(os.getenv("MATCHER_SHARDS", 0)):
+        raise RuntimeError(f"MATCHER_SHARDS=0 needs a single worker, not {server.cfg.workers}")
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the aggregated /metrics.
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,22 @@
 #!/bin/bash
 
-sleep 20
+python -m app.startup --timeout "${DB_WAIT_TIMEOUT:-60}" || exit 1
 
-gunicorn app.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8080
\ No newline at end of file
+alembic upgrade head || exit 1
+
+# Shared by the workers and matchers so /metrics aggregates every process.
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/mstock-metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Each ticker is matched by exactly one matcher process; the HTTP workers
+# forward orders to it over a unix socket in MATCHER_SOCKET_DIR.
+export MATCHER_SHARDS=${MATCHER_SHARDS:-2}
+export MATCHER_SOCKET_DIR=${MATCHER_SOCKET_DIR:-/tmp/mstock}
+mkdir -p "$MATCHER_SOCKET_DIR"
+
+for shard in $(seq 0 $((MATCHER_SHARDS - 1))); do
+    (while true; do python -m app.matcher --shard "$shard"; sleep 1; done) &
+done
+
+gunicorn app.main:app --config docker/gunicorn.conf.py --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8080
\ No newline at end of file
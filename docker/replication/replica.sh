@@ -0,0 +1,13 @@
+#!/bin/bash
+# Clones the primary on first start, then runs as a hot standby streaming from it.
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until PGPASSWORD="${REPLICATION_PASSWORD:-replicator}" \
+        pg_basebackup --host=db --username=replicator --pgdata="$PGDATA" --wal-method=stream --write-recovery-conf; do
+        sleep 1
+    done
+    chmod 0700 "$PGDATA"
+fi
+
+exec postgres -c hot_standby=on
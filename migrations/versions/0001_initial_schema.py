@@ -0,0 +1,144 @@
+"""Initial schema
+
+Databases bootstrapped by Base.metadata.create_all before migrations existed
+are adopted as they are: only the missing tables are created.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+user_role = postgresql.ENUM('USER', 'ADMIN', name='userrole', create_type=False)
+direction = postgresql.ENUM('BUY', 'SELL', name='direction', create_type=False)
+order_status = postgresql.ENUM(
+    'NEW', 'EXECUTED', 'PARTIALLY_EXECUTED', 'CANCELLED', name='orderstatus', create_type=False
+)
+
+TABLES = {
+    "users": lambda: op.create_table(
+        "users",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False),
+        sa.Column("role", user_role),
+        sa.Column("api_key", sa.String(36)),
+    ),
+    "instruments": lambda: op.create_table(
+        "instruments",
+        sa.Column("ticker", sa.String(10), primary_key=True),
+        sa.Column("name", sa.String(50)),
+    ),
+    "orders": lambda: op.create_table(
+        "orders",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id")),
+        sa.Column("direction", direction),
+        sa.Column("ticker", sa.String(10)),
+        sa.Column("qty", sa.Integer),
+        sa.Column("price", sa.Integer),
+        sa.Column("status", order_status),
+        sa.Column("order_type", sa.String(10)),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("filled", sa.Integer),
+    ),
+    "orders_archive": lambda: op.create_table(
+        "orders_archive",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True)),
+        sa.Column("direction", direction),
+        sa.Column("ticker", sa.String(10)),
+        sa.Column("qty", sa.Integer),
+        sa.Column("price", sa.Integer),
+        sa.Column("status", order_status),
+        sa.Column("order_type", sa.String(10)),
+        sa.Column("created_at", sa.DateTime, primary_key=True),
+        sa.Column("filled", sa.Integer),
+        postgresql_partition_by="RANGE (created_at)",
+    ),
+    "balances": lambda: op.create_table(
+        "balances",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("ticker", sa.String(10), primary_key=True),
+        sa.Column("amount", sa.Integer),
+    ),
+    "transactions": lambda: op.create_table(
+        "transactions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("ticker", sa.String(10)),
+        sa.Column("amount", sa.Integer),
+        sa.Column("price", sa.Integer),
+        sa.Column("timestamp", sa.DateTime),
+    ),
+    "candles": lambda: op.create_table(
+        "candles",
+        sa.Column("ticker", sa.String(10), primary_key=True),
+        sa.Column("interval", sa.String(3), primary_key=True),
+        sa.Column("bucket", sa.DateTime, primary_key=True),
+        sa.Column("open", sa.Integer, nullable=False),
+        sa.Column("high", sa.Integer, nullable=False),
+        sa.Column("low", sa.Integer, nullable=False),
+        sa.Column("close", sa.Integer, nullable=False),
+        sa.Column("volume", sa.BigInteger, nullable=False),
+    ),
+    "order_events": lambda: op.create_table(
+        "order_events",
+        sa.Column("seq", sa.BigInteger, primary_key=True, autoincrement=True),
+        sa.Column("ticker", sa.String(10), nullable=False),
+        sa.Column("kind", sa.String(10), nullable=False),
+        sa.Column("order_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("payload", postgresql.JSONB, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    ),
+    "book_snapshots": lambda: op.create_table(
+        "book_snapshots",
+        sa.Column("id", sa.BigInteger, primary_key=True, autoincrement=True),
+        sa.Column("ticker", sa.String(10), nullable=False),
+        sa.Column("seq", sa.BigInteger, nullable=False),
+        sa.Column("payload", postgresql.JSONB, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    ),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    for enum in (user_role, direction, order_status):
+        enum.create(bind, checkfirst=True)
+
+    existing = set(sa.inspect(bind).get_table_names())
+    for name, create in TABLES.items():
+        if name not in existing:
+            create()
+
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_api_key ON users (api_key)")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_api_key_invalidated() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('api_key_invalidated', OLD.api_key);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER users_api_key_invalidated
+        AFTER UPDATE OF role, api_key OR DELETE ON users
+        FOR EACH ROW WHEN (OLD.api_key IS NOT NULL)
+        EXECUTE FUNCTION notify_api_key_invalidated()
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS users_api_key_invalidated ON users")
+    op.execute("DROP FUNCTION IF EXISTS notify_api_key_invalidated()")
+    for name in reversed(list(TABLES)):
+        op.drop_table(name)
+    bind = op.get_bind()
+    for enum in (order_status, direction, user_role):
+        enum.drop(bind, checkfirst=True)
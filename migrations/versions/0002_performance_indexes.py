@@ -0,0 +1,66 @@
+"""Indexes for the hot order, trade and journal queries
+
+Built CONCURRENTLY so a live orders/transactions table is not locked against
+writes; IF NOT EXISTS covers tables that create_all already indexed.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_orders_active_book", "orders", ["ticker", "direction", "price", "created_at"],
+            postgresql_where=sa.text("status IN ('NEW', 'PARTIALLY_EXECUTED')"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            "ix_orders_user_id_created_at", "orders", ["user_id", "created_at", "id"],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            "ix_transactions_ticker_timestamp_desc", "transactions",
+            ["ticker", sa.text("timestamp DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        # Superseded by the descending index above.
+        op.drop_index(
+            "ix_transactions_ticker_timestamp", "transactions",
+            postgresql_concurrently=True, if_exists=True
+        )
+        op.create_index(
+            "ix_order_events_ticker_seq", "order_events", ["ticker", "seq"],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            "ix_book_snapshots_ticker_seq", "book_snapshots", ["ticker", "seq"],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+    # Partitioned tables cannot be indexed concurrently; the index cascades to every partition.
+    op.create_index(
+        "ix_orders_archive_user_id_created_at", "orders_archive", ["user_id", "created_at", "id"],
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index("ix_orders_archive_user_id_created_at", "orders_archive", if_exists=True)
+    with op.get_context().autocommit_block():
+        for name, table in (
+            ("ix_book_snapshots_ticker_seq", "book_snapshots"),
+            ("ix_order_events_ticker_seq", "order_events"),
+            ("ix_transactions_ticker_timestamp_desc", "transactions"),
+            ("ix_orders_user_id_created_at", "orders"),
+            ("ix_orders_active_book", "orders"),
+        ):
+            op.drop_index(name, table, postgresql_concurrently=True, if_exists=True)
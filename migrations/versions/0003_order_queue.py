@@ -0,0 +1,34 @@
+"""Queue of orders accepted before matching
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "order_queue",
+        sa.Column("seq", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "order_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("orders.id", ondelete="CASCADE"),
+            nullable=False, unique=True
+        ),
+        sa.Column("ticker", sa.String(10), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        if_not_exists=True
+    )
+    op.create_index("ix_order_queue_ticker_seq", "order_queue", ["ticker", "seq"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_order_queue_ticker_seq", "order_queue", if_exists=True)
+    op.drop_table("order_queue", if_exists=True)
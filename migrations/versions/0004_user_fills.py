@@ -0,0 +1,42 @@
+"""Per-user fill history
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+direction = postgresql.ENUM('BUY', 'SELL', name='direction', create_type=False)
+
+
+def upgrade():
+    op.create_table(
+        "fills",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("order_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("counter_order_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("ticker", sa.String(10), nullable=False),
+        sa.Column("side", direction, nullable=False),
+        sa.Column("qty", sa.Integer(), nullable=False),
+        sa.Column("price", sa.Integer(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column(
+            "xid", sa.BigInteger(), nullable=False,
+            server_default=sa.text("CAST(CAST(pg_current_xact_id() AS text) AS bigint)")
+        ),
+        if_not_exists=True
+    )
+    op.create_index("ix_fills_user_id_xid", "fills", ["user_id", "xid", "id"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_fills_user_id_xid", "fills", if_exists=True)
+    op.drop_table("fills", if_exists=True)
@@ -0,0 +1,92 @@
+"""Fail if a hot query can only be answered by a sequential scan.
+
+Sequential scans are disabled for the session, so the planner falls back to
+one only when no index can serve the query. Run against a migrated database:
+
+    python -m scripts.check_query_plans
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import select, tuple_
+
+from app.database import engine
+from app.endpoints import SYNC_HORIZON
+from app.journal import resting_orders_query
+from app.models import User, Order, OrderArchive, Balance, Transaction, Candle, OrderEvent, BookSnapshot, UserFill
+from app.pagination import DEFAULT_PAGE_SIZE
+from app.schemas import ACTIVE_STATUSES, Direction, CandleInterval
+
+TICKER = "MEMCOIN"
+USER_ID = uuid4()
+NOW = datetime.utcnow()
+
+
+def hot_queries():
+    return {
+        "api key lookup": select(User).filter(User.api_key == str(uuid4())),
+        "balances": select(Balance).filter(Balance.user_id == USER_ID),
+        "book recovery": resting_orders_query().filter(Order.ticker == TICKER),
+        "resting side by price": select(Order).filter(
+            Order.ticker == TICKER,
+            Order.direction == Direction.SELL,
+            Order.status.in_(ACTIVE_STATUSES)
+        ).order_by(Order.price, Order.created_at),
+        "order list page": select(Order).filter(
+            Order.user_id == USER_ID,
+            tuple_(Order.created_at, Order.id) < (NOW, USER_ID)
+        ).order_by(Order.created_at.desc(), Order.id.desc()).limit(DEFAULT_PAGE_SIZE),
+        "archived order list page": select(OrderArchive).filter(
+            OrderArchive.user_id == USER_ID
+        ).order_by(OrderArchive.created_at.desc(), OrderArchive.id.desc()).limit(DEFAULT_PAGE_SIZE),
+        "trade history page": select(Transaction).filter(
+            Transaction.ticker == TICKER,
+            tuple_(Transaction.timestamp, Transaction.id) < (NOW, USER_ID)
+        ).order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(DEFAULT_PAGE_SIZE),
+        "fill sync page": select(UserFill).filter(
+            UserFill.user_id == USER_ID,
+            UserFill.xid < SYNC_HORIZON,
+            tuple_(UserFill.xid, UserFill.id) > (0, USER_ID)
+        ).order_by(UserFill.xid, UserFill.id).limit(DEFAULT_PAGE_SIZE),
+        "candles": select(Candle).filter(
+            Candle.ticker == TICKER, Candle.interval == CandleInterval.MINUTE.value
+        ).order_by(Candle.bucket.desc()).limit(DEFAULT_PAGE_SIZE),
+        "journal tail": select(OrderEvent).filter(
+            OrderEvent.ticker.in_([TICKER]), OrderEvent.seq > 0
+        ).order_by(OrderEvent.seq),
+        "latest snapshot": select(BookSnapshot).filter(
+            BookSnapshot.ticker == TICKER
+        ).order_by(BookSnapshot.seq.desc()).limit(1),
+    }
+
+
+def seq_scans(plan: dict):
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from seq_scans(child)
+
+
+async def main() -> int:
+    failures = 0
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("SET enable_seqscan = off")
+        for name, query in hot_queries().items():
+            sql = query.compile(engine, compile_kwargs={"literal_binds": True})
+            explained = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+            plan = json.loads(explained)[0]["Plan"]
+            scanned = sorted(set(seq_scans(plan)))
+            if scanned:
+                failures += 1
+                print(f"FAIL {name}: sequential scan on {', '.join(scanned)}")
+            else:
+                print(f"ok   {name}")
+    await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
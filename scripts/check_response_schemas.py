@@ -0,0 +1,119 @@
+"""Check the orjson fast paths against the documented response schemas.
+
+get_orderbook, get_transactions, list_orders and list_fills return ORJSONResponse bodies
+built without pydantic. For sample rows covering the edge cases, each body
+must validate against the route's response_model (the source of its
+OpenAPI schema) and equal what response_model serialization would have
+produced:
+
+    python -m scripts.check_response_schemas
+"""
+import json
+import sys
+from datetime import datetime
+from typing import NamedTuple, Optional
+from uuid import UUID, uuid4
+
+from pydantic import TypeAdapter
+
+from app.endpoints import router
+from app.orderbook import OrderBook
+from app.responses import ORJSONResponse, fill_rows, level_rows, order_rows, transaction_rows
+from app.schemas import Direction
+
+
+class TransactionRow(NamedTuple):
+    ticker: str
+    amount: int
+    price: int
+    timestamp: datetime
+    id: UUID
+
+
+class OrderRow(NamedTuple):
+    direction: Direction
+    ticker: str
+    qty: int
+    price: Optional[int]
+    created_at: datetime
+    id: UUID
+
+
+class FillRow(NamedTuple):
+    order_id: UUID
+    counter_order_id: UUID
+    ticker: str
+    side: Direction
+    qty: int
+    price: int
+    timestamp: datetime
+    id: UUID
+
+
+def response_model(path: str):
+    for route in router.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.response_model
+    raise LookupError(path)
+
+
+def sample_book() -> OrderBook:
+    book = OrderBook("MEMCOIN")
+    for price, qty in ((101, 5), (101, 7), (105, 1)):
+        book.add(uuid4(), uuid4(), Direction.SELL, price, qty)
+    book.add(uuid4(), uuid4(), Direction.BUY, 99, 3)
+    return book
+
+
+def cases():
+    book = sample_book()
+    yield (
+        "/api/v1/public/orderbook/{ticker}",
+        {"bid_levels": level_rows(book.depth(Direction.BUY)), "ask_levels": level_rows(book.depth(Direction.SELL))},
+        {
+            "bid_levels": [{"price": price, "qty": qty} for price, qty in book.depth(Direction.BUY)],
+            "ask_levels": [{"price": price, "qty": qty} for price, qty in book.depth(Direction.SELL)],
+        },
+    )
+
+    transactions = [
+        TransactionRow("MEMCOIN", 3, 101, datetime(2026, 1, 2, 3, 4, 5, 60700), uuid4()),
+        TransactionRow("MEMCOIN", 1, 99, datetime(2026, 1, 2, 3, 4, 5), uuid4()),
+    ]
+    yield "/api/v1/public/transactions/{ticker}", transaction_rows(transactions), transactions
+
+    orders = [
+        OrderRow(Direction.BUY, "MEMCOIN", 10, 101, datetime(2026, 1, 2), uuid4()),
+        OrderRow(Direction.SELL, "MEMCOIN", 4, None, datetime(2026, 1, 1), uuid4()),
+    ]
+    yield "/api/v1/order", order_rows(orders), orders
+
+    fills = [
+        FillRow(uuid4(), uuid4(), "MEMCOIN", Direction.BUY, 3, 101, datetime(2026, 1, 2, 3, 4, 5, 60700), uuid4()),
+        FillRow(uuid4(), uuid4(), "MEMCOIN", Direction.SELL, 1, 99, datetime(2026, 1, 2, 3, 4, 5), uuid4()),
+    ]
+    yield "/api/v1/fills", fill_rows(fills), fills
+
+
+def main() -> int:
+    failures = 0
+    for path, fast, rows in cases():
+        adapter = TypeAdapter(response_model(path))
+        body = json.loads(ORJSONResponse(fast).body)
+        expected = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        try:
+            adapter.validate_python(body)
+        except ValueError as exc:
+            failures += 1
+            print(f"FAIL {path}: does not match the response schema\n{exc}")
+            continue
+        if body != expected:
+            failures += 1
+            print(f"FAIL {path}:\n  fast path  {body}\n  expected   {expected}")
+        else:
+            print(f"ok   {path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+from uuid import uuid4
+
+import asyncpg
+import pytest
+from fastapi.testclient import TestClient
+
+# app.database builds its engines at import; these only apply when the
+# environment (or .env-prod) does not configure a database.
+for name, value in {
+    "DB_HOST": "localhost", "DB_PORT": "5432", "DB_NAME": "postgres", "DB_USER": "postgres", "DB_PASS": "postgres"
+}.items():
+    os.environ.setdefault(name, value)
+# Tests drive many requests per user, and must not share buckets with a running instance.
+for name in ("RATE_LIMIT_TRADING_RATE", "RATE_LIMIT_MARKET_DATA_RATE", "RATE_LIMIT_ADMIN_RATE"):
+    os.environ.setdefault(name, "0")
+os.environ.setdefault("RATE_LIMIT_DB", os.path.join(tempfile.mkdtemp(), "ratelimit.sqlite"))
+
+
+async def _reachable(dsn: str) -> bool:
+    try:
+        conn = await asyncpg.connect(dsn, timeout=2)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+        return False
+    await conn.close()
+    return True
+
+
+@pytest.fixture(scope="session")
+def database():
+    from app.database import DATABASE_DSN
+
+    if not asyncio.run(_reachable(DATABASE_DSN)):
+        pytest.skip("No database at DB_HOST:DB_PORT")
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    # The whole app against a migrated database, matching in this process.
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def _register(client: TestClient, name: str) -> dict:
+    response = client.post("/public/register", json={"name": name})
+    response.raise_for_status()
+    return response.json()
+
+
+def auth(user: dict) -> dict:
+    return {"Authorization": f"TOKEN {user['api_key']}"}
+
+
+def place(client, user: dict, ticker: str, direction: str = "BUY", price: int = 100, qty: int = 1) -> str:
+    response = client.post(
+        "/api/v1/order", json={"direction": direction, "ticker": ticker, "qty": qty, "price": price}, headers=auth(user)
+    )
+    response.raise_for_status()
+    return response.json()["order_id"]
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    from app.database import DATABASE_DSN
+
+    user = _register(client, "test-admin")
+
+    async def promote():
+        # There is no endpoint that grants the admin role.
+        conn = await asyncpg.connect(DATABASE_DSN)
+        try:
+            await conn.execute("UPDATE users SET role = 'ADMIN' WHERE id = $1::uuid", user["id"])
+        finally:
+            await conn.close()
+
+    asyncio.run(promote())
+    return user
+
+
+@pytest.fixture
+def ticker(client, admin) -> str:
+    ticker = f"T{uuid4().hex[:8].upper()}"
+    response = client.post("/api/v1/admin/instrument", json={"name": ticker, "ticker": ticker}, headers=auth(admin))
+    response.raise_for_status()
+    return ticker
+
+
+@pytest.fixture
+def trader(client, admin, ticker):
+    # Makes users funded with both the instrument and the settlement currency.
+    from app.settlement import SETTLEMENT_CURRENCY
+
+    def make() -> dict:
+        user = _register(client, "test-trader")
+        for asset in (ticker, SETTLEMENT_CURRENCY):
+            response = client.post(
+                "/api/v1/admin/balance/deposit",
+                json={"user_id": user["id"], "ticker": asset, "amount": 10 ** 6}, headers=auth(admin)
+            )
+            response.raise_for_status()
+        return user
+
+    return make
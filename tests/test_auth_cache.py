@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import asyncpg
+import pytest
+
+from app import auth, cache
+from app.cache import TTLCache
+from tests.conftest import auth as headers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire(clock):
+    entries = TTLCache(maxsize=10, ttl=60)
+    entries.set("key", "user")
+
+    clock[0] += 59
+    assert entries.get("key") == "user"
+    clock[0] += 2
+    assert entries.get("key") is None
+    assert len(entries) == 0
+
+
+def test_least_recently_used_is_evicted(clock):
+    entries = TTLCache(maxsize=2, ttl=60)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+
+    assert (entries.get("a"), entries.get("b"), entries.get("c")) == (1, None, 3)
+
+
+def test_notification_drops_the_key(monkeypatch):
+    entries = TTLCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(auth, "api_key_cache", entries)
+    entries.set("changed", "user")
+    entries.set("other", "user")
+
+    auth._on_invalidation(None, 0, auth.INVALIDATION_CHANNEL, "changed")
+
+    assert entries.get("changed") is None and entries.get("other") == "user"
+
+
+def test_role_change_in_the_database_reaches_the_cache(client, trader):
+    from app.database import DATABASE_DSN
+
+    user = trader()
+
+    def as_admin():
+        return client.delete("/api/v1/admin/instrument/NOPE", headers=headers(user)).status_code
+
+    assert as_admin() == 403
+
+    async def promote():
+        # Straight in the database: only the users trigger's NOTIFY tells the app.
+        conn = await asyncpg.connect(DATABASE_DSN)
+        try:
+            await conn.execute("UPDATE users SET role = 'ADMIN' WHERE id = $1::uuid", user["id"])
+        finally:
+            await conn.close()
+
+    asyncio.run(promote())
+    deadline = time.monotonic() + 5
+    while as_admin() == 403 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert as_admin() == 404
@@ -0,0 +1,59 @@
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.bulk import parse_rows
+from app.schemas import BulkBalanceOperation, NewUser
+
+USER_ID = str(uuid4())
+
+
+def test_csv_rows_are_numbered_after_the_header():
+    body = f"user_id,ticker,amount,op\n{USER_ID},MEMCOIN,10,deposit\n{USER_ID},RUB,5,withdraw\n".encode()
+
+    rows, errors = parse_rows(body, "text/csv", BulkBalanceOperation)
+
+    assert errors == []
+    assert [(row, operation.ticker, operation.amount, operation.op) for row, operation in rows] == [
+        (1, "MEMCOIN", 10, "deposit"), (2, "RUB", 5, "withdraw"),
+    ]
+
+
+def test_ndjson_skips_blank_lines_and_reports_malformed_rows():
+    body = b'{"name": "alice"}\n\nnot json\n[1, 2]\n{"name": "bob"}\n'
+
+    rows, errors = parse_rows(body, "application/x-ndjson", NewUser)
+
+    assert [(row, user.name) for row, user in rows] == [(1, "alice"), (4, "bob")]
+    assert errors == [{"row": 2, "detail": "Malformed row"}, {"row": 3, "detail": "Malformed row"}]
+
+
+def test_validation_errors_name_the_field():
+    body = f"user_id,ticker,amount,op\n{USER_ID},MEMCOIN,0,steal\n".encode()
+
+    rows, errors = parse_rows(body, "text/csv", BulkBalanceOperation)
+
+    assert rows == []
+    assert [error["row"] for error in errors] == [1]
+    assert errors[0]["detail"].startswith("amount: ")
+    assert "; op: " in errors[0]["detail"]
+
+
+@pytest.mark.parametrize("body, content_type, status_code", [
+    (b"\xff\xfe", "text/csv", 400),
+    (b'{"name": "alice"}', "application/json", 415),
+])
+def test_rejected_bodies(body, content_type, status_code):
+    with pytest.raises(HTTPException) as exc:
+        parse_rows(body, content_type, NewUser)
+    assert exc.value.status_code == status_code
+
+
+def test_row_limit(monkeypatch):
+    monkeypatch.setattr("app.bulk.BULK_MAX_ROWS", 2)
+
+    assert len(parse_rows(b"name\nalice\nbob\n", "text/csv", NewUser)[0]) == 2
+    with pytest.raises(HTTPException) as exc:
+        parse_rows(b"name\nalice\nbob\ncarol\n", "text/csv", NewUser)
+    assert exc.value.status_code == 413
@@ -0,0 +1,34 @@
+from uuid import uuid4
+
+from tests.conftest import auth, place
+
+
+def test_one_result_per_requested_id(client, ticker, trader):
+    me, other = trader(), trader()
+    active, cancelled = place(client, me, ticker), place(client, me, ticker)
+    client.delete(f"/api/v1/order/{cancelled}", headers=auth(me)).raise_for_status()
+    foreign, unknown = place(client, other, ticker), str(uuid4())
+
+    response = client.delete(
+        "/api/v1/orders", params={"ids": [unknown, active, cancelled, foreign, active]}, headers=auth(me)
+    )
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"order_id": unknown, "success": False, "detail": "Order not found"},
+        {"order_id": active, "success": True, "detail": None},
+        {"order_id": cancelled, "success": False, "detail": "Order is not active"},
+        {"order_id": foreign, "success": False, "detail": "Order not found"},
+    ]
+
+
+def test_ids_outside_the_filters_are_reported(client, ticker, trader):
+    me = trader()
+    bid, ask = place(client, me, ticker, "BUY", 90), place(client, me, ticker, "SELL", 110)
+
+    response = client.delete("/api/v1/orders", params={"ids": [bid, ask], "direction": "SELL"}, headers=auth(me))
+
+    assert response.json() == [
+        {"order_id": bid, "success": False, "detail": "Order does not match ticker or direction"},
+        {"order_id": ask, "success": True, "detail": None},
+    ]
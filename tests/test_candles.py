@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from app.candles import bucket_start, naive_utc, rollup
+from app.schemas import CandleInterval
+
+START = datetime(2026, 1, 2, 3, 0)
+
+
+def test_bucket_start():
+    timestamp = datetime(2026, 1, 2, 3, 7, 42, 5)
+    assert bucket_start(timestamp, CandleInterval.MINUTE) == datetime(2026, 1, 2, 3, 7)
+    assert bucket_start(timestamp, CandleInterval.FIVE_MINUTES) == datetime(2026, 1, 2, 3, 5)
+    assert bucket_start(timestamp, CandleInterval.HOUR) == datetime(2026, 1, 2, 3)
+    assert bucket_start(timestamp, CandleInterval.DAY) == datetime(2026, 1, 2)
+
+
+def test_naive_utc():
+    moscow = timezone(timedelta(hours=3))
+    assert naive_utc(datetime(2026, 1, 2, 6, 0, tzinfo=moscow)) == START
+    assert naive_utc(START) == START
+
+
+def test_minute_candles():
+    rolled = rollup([
+        (START + timedelta(seconds=1), 2, 100),
+        (START + timedelta(seconds=30), 1, 105),
+        (START + timedelta(seconds=59), 3, 98),
+        (START + timedelta(minutes=1), 1, 101),
+    ])
+
+    assert rolled[CandleInterval.MINUTE] == {
+        START: [100, 105, 98, 98, 6],
+        START + timedelta(minutes=1): [101, 101, 101, 101, 1],
+    }
+
+
+def test_coarser_candles_roll_up_finer_ones():
+    trades = [(START + timedelta(minutes=minute), minute + 1, 100 + minute % 7) for minute in range(0, 130, 3)]
+    rolled = rollup(trades)
+
+    for interval in (CandleInterval.FIVE_MINUTES, CandleInterval.HOUR, CandleInterval.DAY):
+        expected = {}
+        for timestamp, qty, price in trades:
+            candle = expected.setdefault(bucket_start(timestamp, interval), [price, price, price, price, 0])
+            candle[1], candle[2] = max(candle[1], price), min(candle[2], price)
+            candle[3] = price
+            candle[4] += qty
+        assert rolled[interval] == expected
+    assert list(rolled[CandleInterval.HOUR]) == [START, START + timedelta(hours=1), START + timedelta(hours=2)]
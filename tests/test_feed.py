@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.endpoints import router
+from app.feed import MAX_PENDING_LEVELS, MAX_PENDING_TRADES, MAX_SUBSCRIPTIONS, MarketDataFeed, Subscriber
+from app.orderbook import OrderBook
+from app.schemas import Direction
+
+TIMESTAMP = datetime(2026, 1, 2, 3, 4, 5)
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    feed = MarketDataFeed()
+    monkeypatch.setattr("app.feed.feed", feed)
+    return feed
+
+
+def subscribed(feed: MarketDataFeed, *tickers: str) -> Subscriber:
+    subscriber = Subscriber(websocket=None)
+    feed.subscribe(subscriber, tickers)
+    subscriber._take()
+    return subscriber
+
+
+def test_level_updates_coalesce(feed):
+    subscriber = subscribed(feed, "MEMCOIN")
+    feed.broadcast("MEMCOIN", [(Direction.BUY, 100, 5), (Direction.SELL, 105, 1)], [])
+    feed.broadcast("MEMCOIN", [(Direction.BUY, 100, 2), (Direction.BUY, 101, 4)], [])
+
+    assert subscriber._take() == [{
+        "type": "levels", "ticker": "MEMCOIN", "seq": 2,
+        "bid_levels": [[101, 4], [100, 2]], "ask_levels": [[105, 1]],
+    }]
+    assert subscriber._take() == []
+
+
+def test_lagging_subscriber_is_resynced_with_a_snapshot(feed):
+    subscriber = subscribed(feed, "MEMCOIN")
+    feed.broadcast("MEMCOIN", [(Direction.BUY, price, 1) for price in range(MAX_PENDING_LEVELS + 1)], [])
+
+    (message,) = subscriber._take()
+    assert message["type"] == "snapshot" and message["seq"] == 1
+
+
+def test_trades_beyond_the_backlog_are_dropped_and_counted(feed):
+    subscriber = subscribed(feed, "MEMCOIN")
+    trades = [{"ticker": "MEMCOIN", "amount": 1, "price": price} for price in range(MAX_PENDING_TRADES + 7)]
+    feed.broadcast("MEMCOIN", [], trades[:MAX_PENDING_TRADES])
+    feed.broadcast("MEMCOIN", [], trades[MAX_PENDING_TRADES:])
+
+    (message,) = subscriber._take()
+    assert message["dropped"] == 7
+    assert message["trades"] == trades[7:]
+
+
+def test_publish_sends_book_changes_and_trades(feed):
+    subscriber = subscribed(feed, "MEMCOIN")
+    book = OrderBook("MEMCOIN")
+    book.add(uuid4(), uuid4(), Direction.SELL, 101, 5)
+    book.drain_changes()
+    fills, _ = book.match(Direction.BUY, 2)
+    feed.publish(book, fills, TIMESTAMP)
+
+    levels, trades = subscriber._take()
+    assert levels["ask_levels"] == [[101, 3]]
+    assert trades["trades"] == [
+        {"ticker": "MEMCOIN", "amount": 2, "price": 101, "timestamp": TIMESTAMP.isoformat()}
+    ]
+
+
+def test_other_tickers_and_unsubscribed_clients_get_nothing(feed):
+    subscriber = subscribed(feed, "MEMCOIN")
+    feed.broadcast("DODGE", [(Direction.BUY, 100, 1)], [])
+    feed.unsubscribe(subscriber, ["MEMCOIN"])
+    feed.broadcast("MEMCOIN", [(Direction.BUY, 100, 1)], [])
+
+    assert subscriber._take() == []
+    assert feed.subscribers == {}
+
+
+def test_snapshots_of_unknown_tickers_leave_no_state(feed):
+    subscriber = Subscriber(websocket=None)
+    subscriber.push_snapshot("NOPE")
+    subscriber._take()
+
+    assert "NOPE" not in feed.seq
+
+
+def test_outcomes_reach_only_the_user(feed):
+    mine, other = Subscriber(websocket=None), Subscriber(websocket=None)
+    feed.subscribe_orders(mine, "user-1")
+    feed.subscribe_orders(other, "user-2")
+    feed.notify_user("user-1", {"type": "order", "status": "EXECUTED"})
+
+    assert mine._take() == [{"type": "order", "status": "EXECUTED"}]
+    assert other._take() == []
+
+
+def test_run_sends_pending_messages(feed):
+    sent = []
+
+    class WebSocket:
+        async def send_json(self, message):
+            sent.append(message)
+
+    async def main():
+        subscriber = Subscriber(WebSocket())
+        feed.subscribe(subscriber, ["MEMCOIN"])
+        task = asyncio.create_task(subscriber.run())
+        await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(main())
+    assert [message["type"] for message in sent] == ["snapshot"]
+
+
+@pytest.mark.parametrize("message, detail", [
+    ([], "Expected a JSON object"),
+    ({"action": "subscribe", "tickers": "MEMCOIN"}, "tickers must be a list of strings"),
+    ({"action": "subscribe", "tickers": ["MEMCOIN", 1]}, "tickers must be a list of strings"),
+    (
+        {"action": "subscribe", "tickers": [f"T{n}" for n in range(MAX_SUBSCRIPTIONS + 1)]},
+        f"At most {MAX_SUBSCRIPTIONS} tickers per connection"
+    ),
+])
+def test_invalid_subscriptions_are_rejected(message, detail):
+    app = FastAPI()
+    app.include_router(router)
+    with TestClient(app).websocket_connect("/api/v1/public/ws") as websocket:
+        websocket.send_json(message)
+        assert websocket.receive_json() == {"type": "error", "detail": detail}
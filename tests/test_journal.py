@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.events import CANCEL
+from app.journal import apply_event, restore, snapshot_payload
+from app.orderbook import OrderBook
+from app.schemas import Direction, OrderStatus
+from app.settlement import Settlement, match_order
+
+
+def order(direction: Direction, qty: int, price=None):
+    return SimpleNamespace(
+        id=uuid4(), user_id=uuid4(), direction=direction, order_type="limit" if price else "market",
+        price=price, qty=qty, filled=0, status=OrderStatus.NEW
+    )
+
+
+def resting(book: OrderBook) -> list:
+    return [(r.id, r.user_id, r.direction, r.price, r.qty, r.remaining) for r in book.resting()]
+
+
+def replay(book: OrderBook, settlement: Settlement):
+    for event in settlement.events:
+        apply_event(book, event["kind"], event["order_id"], event["payload"])
+
+
+def test_snapshot_restores_the_book_in_priority_order():
+    book = OrderBook("MEMCOIN")
+    settlement = Settlement("MEMCOIN")
+    for direction, qty, price in [(Direction.SELL, 5, 101), (Direction.SELL, 3, 101), (Direction.BUY, 4, 99)]:
+        match_order(book, order(direction, qty, price), settlement)
+    match_order(book, order(Direction.BUY, 2), settlement)
+
+    restored = restore("MEMCOIN", snapshot_payload(book))
+
+    assert resting(restored) == resting(book)
+    assert restored.depth(Direction.SELL) == [(101, 6)]
+
+
+def test_replaying_events_rebuilds_the_book():
+    live = OrderBook("MEMCOIN")
+    settlement = Settlement("MEMCOIN")
+    orders = [
+        order(Direction.SELL, 5, 101), order(Direction.SELL, 5, 102), order(Direction.BUY, 3, 100),
+        order(Direction.BUY, 7, 102), order(Direction.SELL, 1), order(Direction.BUY, 4, 103),
+    ]
+    for each in orders:
+        match_order(live, each, settlement)
+
+    replayed = OrderBook("MEMCOIN")
+    replay(replayed, settlement)
+
+    assert resting(replayed) == resting(live)
+
+
+def test_replay_continues_from_a_snapshot():
+    live = OrderBook("MEMCOIN")
+    before = Settlement("MEMCOIN")
+    for each in [order(Direction.SELL, 5, 101), order(Direction.BUY, 2, 99)]:
+        match_order(live, each, before)
+    snapshot = snapshot_payload(live)
+
+    after = Settlement("MEMCOIN")
+    for each in [order(Direction.BUY, 3, 101), order(Direction.SELL, 4, 98)]:
+        match_order(live, each, after)
+    cancelled = next(iter(live.resting()))
+    after.record(CANCEL, cancelled.id, remaining=cancelled.remaining)
+    live.cancel(cancelled.id)
+
+    recovered = restore("MEMCOIN", snapshot)
+    replay(recovered, after)
+
+    assert resting(recovered) == resting(live)
@@ -0,0 +1,35 @@
+from app.database import AsyncSessionLocal
+from tests.conftest import auth, place
+
+
+def pages(client, user: dict, **params) -> list:
+    prices, cursor = [], None
+    while True:
+        query = {**params, "limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/order", params=query, headers=auth(user))
+        response.raise_for_status()
+        prices += [order["price"] for order in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return prices
+
+
+def test_live_and_archived_orders_are_paged_once_each(client, ticker, trader, monkeypatch):
+    from app import archive
+
+    me = trader()
+    placed = [place(client, me, ticker, price=price) for price in (90, 91, 92, 93)]
+    for order_id in placed[1:3]:
+        client.delete(f"/api/v1/order/{order_id}", headers=auth(me)).raise_for_status()
+
+    async def archive_now():
+        async with AsyncSessionLocal() as db:
+            await archive.archive_batch(db)
+            await db.commit()
+
+    monkeypatch.setattr(archive, "ARCHIVE_AFTER", archive.timedelta(0))
+    client.portal.call(archive_now)
+
+    # One order per page, so any order read from both tables would repeat.
+    assert sorted(pages(client, me)) == [90, 91, 92, 93]
+    assert sorted(pages(client, me, status="CANCELLED")) == [91, 92]
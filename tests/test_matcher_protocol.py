@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.feed import MarketDataFeed
+from app.matcher import MatcherServer, _ShardConnection, shard_for, socket_path
+from app.orderbook import OrderBook, books
+from app.schemas import Direction
+
+TICKERS = [f"T{i:04}" for i in range(500)]
+
+
+@pytest.fixture
+def sockets(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.matcher.MATCHER_SOCKET_DIR", str(tmp_path))
+    monkeypatch.setattr("app.matcher.feed", MarketDataFeed())
+    saved = dict(books)
+    books.clear()
+    yield tmp_path
+    books.clear()
+    books.update(saved)
+
+
+def test_shard_for_is_stable_and_in_range():
+    shards = [shard_for(ticker, 4) for ticker in TICKERS]
+    assert shards == [shard_for(ticker, 4) for ticker in TICKERS]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_adding_a_shard_only_moves_tickers_to_it():
+    for ticker in TICKERS:
+        before, after = shard_for(ticker, 4), shard_for(ticker, 5)
+        assert after in (before, 4)
+
+
+async def connected(connection: _ShardConnection) -> asyncio.Task:
+    task = asyncio.create_task(connection.run(retry_interval=0.01))
+    while not connection.synced:
+        await asyncio.sleep(0.01)
+    return task
+
+
+def test_request_round_trip(sockets):
+    ticker = next(ticker for ticker in TICKERS if shard_for(ticker, 2) == 1)
+    server = MatcherServer(1, shards=2)
+
+    async def submit(order_ids):
+        if order_ids == ["missing"]:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if order_ids == ["broken"]:
+            raise RuntimeError("boom")
+        return {order_id: ["EXECUTED", 1] for order_id in order_ids}
+
+    server.submit = submit
+
+    async def main():
+        book = books[ticker] = OrderBook(ticker)
+        book.set_level(Direction.BUY, 100, 3)
+        book.set_level(Direction.SELL, 105, 2)
+
+        listening = await asyncio.start_unix_server(server._handle, path=socket_path(1))
+        async with listening:
+            connection = _ShardConnection(1, 2)
+            task = await connected(connection)
+            try:
+                assert books[ticker] is not book
+                assert books[ticker].depth(Direction.BUY) == [(100, 3)]
+                assert books[ticker].depth(Direction.SELL) == [(105, 2)]
+
+                results = await asyncio.gather(*(connection.request("submit", order_ids=[str(i)]) for i in range(5)))
+                assert results == [{str(i): ["EXECUTED", 1]} for i in range(5)]
+
+                with pytest.raises(HTTPException) as exc:
+                    await connection.request("submit", order_ids=["missing"])
+                assert (exc.value.status_code, exc.value.detail) == (404, "Order not found")
+
+                with pytest.raises(HTTPException) as exc:
+                    await connection.request("submit", order_ids=["broken"])
+                assert (exc.value.status_code, exc.value.detail) == (500, "Matcher error")
+                assert connection.pending == {}
+            finally:
+                task.cancel()
+
+    asyncio.run(main())
+
+
+def test_request_without_connection_is_unavailable():
+    connection = _ShardConnection(0, 1)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(connection.request("submit", order_ids=[]))
+    assert exc.value.status_code == 503
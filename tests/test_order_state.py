@@ -0,0 +1,102 @@
+import time
+from types import SimpleNamespace
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_current_user, get_db
+from app.endpoints import router
+from app.schemas import Direction, OrderStatus
+from tests.conftest import auth, place
+
+USER = SimpleNamespace(id=uuid4())
+
+
+class Session:
+    # Answers _get_user_order's lookup with one row.
+    def __init__(self, order):
+        self.order = order
+
+    async def execute(self, query):
+        return SimpleNamespace(scalar_one_or_none=lambda: self.order)
+
+
+@pytest.mark.parametrize("price, expected", [
+    (101, {"direction": "BUY", "ticker": "MEMCOIN", "qty": 5, "price": 101}),
+    (None, {"direction": "BUY", "ticker": "MEMCOIN", "qty": 5}),
+])
+def test_order_carries_its_status(price, expected):
+    order = SimpleNamespace(
+        id=uuid4(), user_id=USER.id, direction=Direction.BUY, ticker="MEMCOIN", qty=5, price=price,
+        status=OrderStatus.PARTIALLY_EXECUTED, filled=2
+    )
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[get_db] = lambda: Session(order)
+
+    response = TestClient(app).get(f"/api/v1/order/{order.id}")
+
+    assert response.json() == {"id": str(order.id), "status": "PARTIALLY_EXECUTED", "filled": 2, **expected}
+
+
+def test_queued_order_reports_its_outcome(client, ticker, trader):
+    from app.matcher import matcher
+
+    maker, taker = trader(), trader()
+    place(client, maker, ticker, "SELL", price=100, qty=2)
+
+    def get(order_id: str) -> dict:
+        response = client.get(f"/api/v1/order/{order_id}", headers=auth(taker))
+        response.raise_for_status()
+        return response.json()
+
+    # The queue consumer matches under the ticker lock, so holding it keeps the order queued.
+    lock = matcher._locks[ticker]
+    client.portal.call(lock.acquire)
+    try:
+        response = client.post(
+            "/api/v1/order", json={"direction": "BUY", "ticker": ticker, "qty": 2, "price": 100},
+            headers={**auth(taker), "Prefer": "respond-async"}
+        )
+        assert response.status_code == 202
+        order_id = response.json()["order_id"]
+        assert get(order_id)["status"] == "NEW" and get(order_id)["filled"] == 0
+    finally:
+        client.portal.call(lock.release)
+
+    deadline = time.monotonic() + 10
+    while get(order_id)["status"] == "NEW" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert get(order_id) == {
+        "id": order_id, "status": "EXECUTED", "filled": 2, "direction": "BUY", "ticker": ticker, "qty": 2, "price": 100
+    }
+
+
+def test_queued_order_is_claimed_once(client, ticker, trader):
+    from app.database import AsyncSessionLocal
+    from app.matcher import matcher
+    from app.order_queue import claim
+
+    async def claim_committed(order_id: UUID):
+        async with AsyncSessionLocal() as db:
+            claimed = await claim(db, [order_id, uuid4()])
+            await db.commit()
+            return claimed
+
+    user = trader()
+    lock = matcher._locks[ticker]
+    client.portal.call(lock.acquire)
+    try:
+        response = client.post(
+            "/api/v1/order", json={"direction": "BUY", "ticker": ticker, "qty": 1, "price": 1},
+            headers={**auth(user), "Prefer": "respond-async"}
+        )
+        order_id = UUID(response.json()["order_id"])
+
+        assert client.portal.call(claim_committed, order_id) == {order_id}
+        assert client.portal.call(claim_committed, order_id) == set()
+    finally:
+        client.portal.call(lock.release)
@@ -0,0 +1,64 @@
+from uuid import uuid4
+
+from app.orderbook import OrderBook
+from app.schemas import Direction
+
+
+def test_better_price_fills_first():
+    book = OrderBook("MEMCOIN")
+    worse, better = uuid4(), uuid4()
+    book.add(worse, uuid4(), Direction.SELL, 102, 5)
+    book.add(better, uuid4(), Direction.SELL, 101, 5)
+
+    fills, remaining = book.match(Direction.BUY, 7, 102)
+
+    assert [(fill.maker_id, fill.qty, fill.price) for fill in fills] == [(better, 5, 101), (worse, 2, 102)]
+    assert remaining == 0
+    assert book.depth(Direction.SELL) == [(102, 3)]
+
+
+def test_earlier_order_fills_first_at_a_price():
+    book = OrderBook("MEMCOIN")
+    first, second = uuid4(), uuid4()
+    book.add(first, uuid4(), Direction.BUY, 100, 3)
+    book.add(second, uuid4(), Direction.BUY, 100, 3)
+
+    fills, _ = book.match(Direction.SELL, 4, 100)
+
+    assert [(fill.maker_id, fill.qty) for fill in fills] == [(first, 3), (second, 1)]
+    assert fills[1].maker_filled == 1 and fills[1].maker_remaining == 2
+    assert first not in book and book.remaining(second) == 2
+
+
+def test_limit_price_stops_matching():
+    book = OrderBook("MEMCOIN")
+    book.add(uuid4(), uuid4(), Direction.SELL, 105, 5)
+
+    fills, remaining = book.match(Direction.BUY, 5, 104)
+
+    assert fills == [] and remaining == 5
+    assert book.depth(Direction.SELL) == [(105, 5)]
+
+
+def test_cancelled_order_is_skipped():
+    book = OrderBook("MEMCOIN")
+    cancelled, resting = uuid4(), uuid4()
+    book.add(cancelled, uuid4(), Direction.SELL, 101, 5)
+    book.add(resting, uuid4(), Direction.SELL, 101, 5)
+    book.cancel(cancelled)
+
+    fills, _ = book.match(Direction.BUY, 5)
+
+    assert [fill.maker_id for fill in fills] == [resting]
+    assert len(book) == 0 and book.depth(Direction.SELL) == []
+
+
+def test_depth_is_best_first():
+    book = OrderBook("MEMCOIN")
+    for price in (99, 101, 100):
+        book.add(uuid4(), uuid4(), Direction.BUY, price, 1)
+        book.add(uuid4(), uuid4(), Direction.SELL, price + 10, 1)
+
+    assert [price for price, _ in book.depth(Direction.BUY)] == [101, 100, 99]
+    assert [price for price, _ in book.depth(Direction.SELL)] == [109, 110, 111]
+    assert book.depth(Direction.BUY, 2) == [(101, 1), (100, 1)]
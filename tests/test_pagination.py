@@ -0,0 +1,35 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, decode_seq_cursor, encode_cursor, encode_seq_cursor
+
+
+def test_cursor_round_trip():
+    timestamp, row_id = datetime(2026, 1, 2, 3, 4, 5, 60700), uuid4()
+    assert decode_cursor(encode_cursor(timestamp, row_id)) == (timestamp, row_id)
+
+
+def test_seq_cursor_round_trip():
+    row_id = uuid4()
+    assert decode_seq_cursor(encode_seq_cursor(2 ** 40, row_id)) == (2 ** 40, row_id)
+
+
+def test_no_cursor():
+    assert decode_cursor(None) is None
+    assert decode_seq_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["", "bm90IGEgY3Vyc29y", encode_seq_cursor(1, uuid4())])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_invalid_seq_cursor():
+    with pytest.raises(HTTPException) as exc:
+        decode_seq_cursor(encode_cursor(datetime(2026, 1, 2), uuid4()))
+    assert exc.value.status_code == 400
@@ -0,0 +1,24 @@
+import asyncio
+import json
+
+import pytest
+
+from app.database import engine
+from scripts.check_query_plans import hot_queries, seq_scans
+
+
+async def plan(query) -> dict:
+    try:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            sql = query.compile(engine, compile_kwargs={"literal_binds": True})
+            explained = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+    finally:
+        # Each test runs its own event loop, which the pooled connections must not outlive.
+        await engine.dispose()
+    return json.loads(explained)[0]["Plan"]
+
+
+@pytest.mark.parametrize("name", list(hot_queries()))
+def test_no_sequential_scan(database, name):
+    assert sorted(set(seq_scans(asyncio.run(plan(hot_queries()[name]))))) == []
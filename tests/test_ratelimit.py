@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app import ratelimit
+from app.ratelimit import ADMIN, MARKET_DATA, TRADING, BucketStore, endpoint_class
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    return now
+
+
+def take(store: BucketStore, key: str = "trading:user:1", rate: float = 2, burst: float = 3):
+    return asyncio.run(store.take(key, rate, burst))
+
+
+def test_burst_then_limited(tmp_path, clock):
+    store = BucketStore(str(tmp_path / "buckets.sqlite"))
+
+    assert [take(store) for _ in range(3)] == [None, None, None]
+    assert take(store) == pytest.approx(0.5)
+
+
+def test_tokens_refill_at_rate(tmp_path, clock):
+    store = BucketStore(str(tmp_path / "buckets.sqlite"))
+    for _ in range(3):
+        take(store)
+
+    clock[0] += 0.5
+    assert take(store) is None
+    assert take(store) == pytest.approx(0.5)
+    clock[0] += 60
+    assert [take(store) for _ in range(3)] == [None, None, None]
+
+
+def test_keys_have_their_own_buckets(tmp_path, clock):
+    store = BucketStore(str(tmp_path / "buckets.sqlite"))
+    for _ in range(3):
+        take(store, "trading:user:1")
+
+    assert take(store, "trading:user:2") is None
+    assert take(store, "trading:user:1") is not None
+
+
+def test_unavailable_store_does_not_limit(tmp_path):
+    store = BucketStore(str(tmp_path / "missing" / "buckets.sqlite"))
+
+    assert [take(store, burst=1) for _ in range(3)] == [None, None, None]
+
+
+def test_endpoint_class():
+    assert endpoint_class("/api/v1/admin/user/1") == ADMIN
+    assert endpoint_class("/api/v1/public/orderbook/MEMCOIN") == MARKET_DATA
+    assert endpoint_class("/public/register") == MARKET_DATA
+    assert endpoint_class("/api/v1/order") == TRADING
+    assert endpoint_class("/health") is None
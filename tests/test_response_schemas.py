@@ -0,0 +1,16 @@
+import json
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.responses import ORJSONResponse
+from scripts.check_response_schemas import cases, response_model
+
+
+@pytest.mark.parametrize("path, fast, rows", [pytest.param(*case, id=case[0]) for case in cases()])
+def test_fast_path_matches_schema(path, fast, rows):
+    adapter = TypeAdapter(response_model(path))
+    body = json.loads(ORJSONResponse(fast).body)
+
+    adapter.validate_python(body)
+    assert body == adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
@@ -0,0 +1,78 @@
+from collections import defaultdict
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.events import ACCEPT, CANCEL, FILL, REST
+from app.orderbook import OrderBook
+from app.schemas import Direction, OrderStatus
+from app.settlement import SETTLEMENT_CURRENCY, Settlement, match_order
+
+
+def order(direction: Direction, qty: int, price=None):
+    return SimpleNamespace(
+        id=uuid4(), user_id=uuid4(), direction=direction, order_type="limit" if price else "market",
+        price=price, qty=qty, filled=0, status=OrderStatus.NEW
+    )
+
+
+def test_fills_are_double_entry():
+    book = OrderBook("MEMCOIN")
+    settlement = Settlement("MEMCOIN")
+    makers = [order(Direction.SELL, 3, 101), order(Direction.SELL, 4, 102)]
+    for maker in makers:
+        match_order(book, maker, settlement)
+    taker = order(Direction.BUY, 5, 102)
+    match_order(book, taker, settlement)
+
+    totals = defaultdict(int)
+    for (_, ticker), delta in settlement.balances.items():
+        totals[ticker] += delta
+    assert totals == {"MEMCOIN": 0, SETTLEMENT_CURRENCY: 0}
+
+    assert settlement.balances[(taker.user_id, "MEMCOIN")] == 5
+    assert settlement.balances[(taker.user_id, SETTLEMENT_CURRENCY)] == -(3 * 101 + 2 * 102)
+    assert settlement.balances[(makers[0].user_id, SETTLEMENT_CURRENCY)] == 3 * 101
+    assert settlement.balances[(makers[1].user_id, "MEMCOIN")] == -2
+
+
+def test_order_statuses():
+    book = OrderBook("MEMCOIN")
+    settlement = Settlement("MEMCOIN")
+    maker = order(Direction.SELL, 10, 100)
+    match_order(book, maker, settlement)
+    taker = order(Direction.BUY, 4, 100)
+    match_order(book, taker, settlement)
+
+    assert taker.status == OrderStatus.EXECUTED and taker.filled == 4
+    assert settlement.orders[maker.id] == (4, OrderStatus.PARTIALLY_EXECUTED)
+    assert book.remaining(maker.id) == 6
+
+
+def test_each_fill_is_recorded_for_both_sides():
+    book = OrderBook("MEMCOIN")
+    settlement = Settlement("MEMCOIN")
+    maker = order(Direction.BUY, 2, 100)
+    match_order(book, maker, settlement)
+    taker = order(Direction.SELL, 2, 99)
+    match_order(book, taker, settlement)
+
+    assert sorted(settlement.user_fills, key=lambda fill: fill[3].value) == [
+        (maker.user_id, maker.id, taker.id, Direction.BUY, 2, 100),
+        (taker.user_id, taker.id, maker.id, Direction.SELL, 2, 100),
+    ]
+
+
+def test_unfilled_limit_rests_and_market_is_cancelled():
+    book = OrderBook("MEMCOIN")
+    settlement = Settlement("MEMCOIN")
+    maker = order(Direction.SELL, 2, 100)
+    match_order(book, maker, settlement)
+    limit = order(Direction.BUY, 5, 99)
+    match_order(book, limit, settlement)
+    market = order(Direction.BUY, 5)
+    match_order(book, market, settlement)
+
+    assert limit.status == OrderStatus.NEW and book.remaining(limit.id) == 5
+    assert market.status == OrderStatus.CANCELLED and market.filled == 2
+    assert [event["kind"] for event in settlement.events] == [ACCEPT, REST, ACCEPT, REST, ACCEPT, FILL, CANCEL]
+    assert settlement.events[-1]["payload"] == {"remaining": 3}
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import orjson
+import pytest
+
+from app.tickers import TickerBoard, TickerStats
+
+
+@pytest.fixture
+def board():
+    board = TickerBoard()
+    board.stats = {"MEMCOIN": TickerStats(), "DODGE": TickerStats()}
+    return board
+
+
+def trade(price: int, qty: int = 1) -> dict:
+    return {"timestamp": datetime.utcnow().isoformat(), "amount": qty, "price": price}
+
+
+def test_etag_changes_with_content(board):
+    body, etag = board.render()
+    board.push_trades("MEMCOIN", [trade(100)])
+    changed_body, changed_etag = board.render()
+
+    assert changed_etag != etag
+    assert [row["last_price"] for row in orjson.loads(changed_body)] == [None, 100]
+
+
+def test_etag_survives_changes_that_do_not_show(board):
+    _, etag = board.render()
+    board.push_levels("MEMCOIN", [])
+
+    assert board.render()[1] == etag
+
+
+def test_boards_with_the_same_state_agree(board):
+    other = TickerBoard()
+    other.stats = {"DODGE": TickerStats(), "MEMCOIN": TickerStats()}
+    for each in (board, other):
+        each.push_trades("MEMCOIN", [trade(100, 2), trade(103)])
+
+    assert board.render() == other.render()
+
+
+def test_rows(board):
+    board.push_trades("MEMCOIN", [trade(100, 2), trade(110, 3)])
+    row = orjson.loads(board.render()[0])[1]
+
+    assert row["ticker"] == "MEMCOIN"
+    assert row["volume_24h"] == 5
+    assert row["change_24h"] == 10 and row["change_24h_percent"] == 10.0
+    assert row["best_bid"] is None and row["spread"] is None
+
+
+def test_reload_keeps_trades_the_replica_has_not_replayed():
+    hour = datetime(2026, 1, 2, 3)
+    pushed = TickerStats()
+    pushed.hours = {hour: [100, 5], hour.replace(hour=4): [104, 2]}
+    pushed.last_price = 106
+    loaded = TickerStats()
+    loaded.hours = {hour: [100, 4]}
+    loaded.last_price = 103
+
+    merged = loaded.merge(pushed)
+
+    assert merged.hours == {hour: [100, 5], hour.replace(hour=4): [104, 2]}
+    assert merged.last_price == 106
+
+
+def test_reload_wins_where_it_is_ahead():
+    hour = datetime(2026, 1, 2, 3)
+    pushed = TickerStats()
+    pushed.hours = {hour: [101, 2]}
+    pushed.last_price = 101
+    loaded = TickerStats()
+    loaded.hours = {hour.replace(hour=2): [90, 1], hour: [100, 7]}
+    loaded.last_price = 99
+
+    merged = loaded.merge(pushed)
+
+    assert list(merged.hours.items()) == [(hour.replace(hour=2), [90, 1]), (hour, [100, 7])]
+    assert merged.last_price == 99
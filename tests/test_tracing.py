@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.tracing import RequestTrace, current_trace, instrument
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    instrument(SimpleNamespace(sync_engine=engine))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def trace():
+    trace = RequestTrace()
+    token = current_trace.set(trace)
+    yield trace
+    current_trace.reset(token)
+
+
+def test_statements_are_timed(engine, trace):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+
+    assert [statement for statement, _ in trace.statements] == ["SELECT 1", "SELECT 2"]
+    assert trace.db_time == pytest.approx(sum(elapsed for _, elapsed in trace.statements))
+
+
+def test_failed_statement_does_not_skew_later_ones(engine, trace):
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT missing FROM nowhere"))
+        conn.execute(text("SELECT 1"))
+        assert not any(key.startswith("trace") for key in conn.info)
+
+    assert [statement for statement, _ in trace.statements] == ["SELECT 1"]
+    assert 0 <= trace.statements[0][1] < 1
+